@@ -7,19 +7,417 @@ Input: prompt (string)
 Output: chart_spec (JSON string) - Vega-Lite format
 """
 
-from typing import Dict, Any, Optional
-import json
-import random
-from llm_utils import chat_completion
-from learning_cache import learning_cache
+from __future__ import annotations
+
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import copy
+import functools
+import hashlib
+import re
+import numpy as np
+import json_utils
+from llm_utils import ChatCompletionBatcher, chat_completion, chat_completion_stream_async
+from learning_cache import learning_cache, semantic_chart_cache
+from config import Config
+from text_utils import keyword_re
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# LLM prompt pieces, built once rather than on every build_chart call
+_SYSTEM_PROMPT = (
+    "You are an expert data visualization specialist. Generate valid Vega-Lite JSON chart specifications "
+    "from user prompts. Create realistic, relevant sample data that matches the user's request. "
+    "Ensure the chart is well-styled, responsive, and follows best practices:\n"
+    "- Include appropriate titles and axis labels\n"
+    "- Use meaningful data that matches the request\n"
+    "- Choose the right chart type for the data\n"
+    "- Include proper styling and colors\n"
+    "- Make sure the chart is readable and informative"
+)
+_USER_MESSAGE_PREFIX = "Create a Vega-Lite chart for: "
+_USER_MESSAGE_SUFFIX = "\n\nGenerate realistic sample data that matches this request and return only the JSON specification."
+
+# LLM responses longer than this are parsed off the event loop by build_chart_async
+_OFFLOAD_PARSE_CHARS = 65536
+
+# Markdown code block around a JSON response, with or without a language tag
+_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+# Routes chart requests, which share the static system prompt prefix, to the same provider-side cache
+_PROMPT_CACHE_KEY = "promptsmith-chart-builder"
+
+# Smallest shape of a renderable Vega-Lite spec, used to guide the model's decoding
+_VEGA_LITE_MIN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "$schema": {"type": "string"},
+        "data": {"type": "object"},
+        "mark": {"type": ["string", "object"]},
+        "encoding": {"type": "object"}
+    },
+    "required": ["$schema", "data", "mark", "encoding"]
+}
+
+# Bare JSON object mode, accepted by every chat model and used for combined batch requests
+_JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+# Constrain responses to the Vega-Lite schema where the model supports it, so the
+# reply is always a parseable spec with no markdown or prose around it
+if Config.CHART_JSON_SCHEMA:
+    _RESPONSE_FORMAT: Dict[str, Any] = {
+        "type": "json_schema",
+        "json_schema": {"name": "vega_lite", "schema": _VEGA_LITE_MIN_SCHEMA, "strict": False}
+    }
+else:
+    _RESPONSE_FORMAT = _JSON_OBJECT_FORMAT
+
+# Completion settings for chart generation; the lower temperature gives more consistent results
+_LLM_ARGS: Dict[str, Any] = {
+    "system_prompt": _SYSTEM_PROMPT,
+    "temperature": 0.2,
+    "max_tokens": 1000,
+    "response_format": _RESPONSE_FORMAT,
+    "prompt_cache_key": _PROMPT_CACHE_KEY
+}
+
+
+def _llm_messages(prompt: str) -> List[Dict[str, str]]:
+    """Build the chat messages asking the LLM for a chart."""
+    return [{"role": "user", "content": _USER_MESSAGE_PREFIX + prompt + _USER_MESSAGE_SUFFIX}]
+
+
+# Framing for several chart prompts sent as one request
+_COMBINED_PREFIX = "Create one Vega-Lite chart specification for each numbered request below.\n\n"
+_COMBINED_SUFFIX = (
+    '\n\nReturn only a JSON object of the form {"charts": [...]} with one specification per request, '
+    "in request order. Number of requests: "
+)
+
+# Completion token limit of the default model, which caps a combined request
+_MAX_COMBINED_TOKENS = 4096
+
+
+class _ChartSpecBatcher(ChatCompletionBatcher):
+    """Batcher that answers concurrent chart prompts with a single LLM request."""
+    
+    def _send(self, messages_batch: List[List[Dict[str, str]]], kwargs: Dict[str, Any]) -> List[str]:
+        if len(messages_batch) == 1:
+            return super()._send(messages_batch, kwargs)
+        
+        requests = "\n\n".join(
+            f"{number}. {messages[-1]['content']}" for number, messages in enumerate(messages_batch, 1)
+        )
+        combined_kwargs = dict(kwargs)
+        # The combined answer wraps several specs, so it cannot follow the single-chart schema
+        combined_kwargs["response_format"] = _JSON_OBJECT_FORMAT
+        combined_kwargs["max_tokens"] = min(
+            kwargs.get("max_tokens", 1024) * len(messages_batch), _MAX_COMBINED_TOKENS
+        )
+        response = chat_completion(
+            [{"role": "user", "content": _COMBINED_PREFIX + requests + _COMBINED_SUFFIX + str(len(messages_batch))}],
+            **combined_kwargs
+        )
+        
+        try:
+            charts = json_utils.loads(response)["charts"]
+        except (json_utils.JSONDecodeError, KeyError, TypeError):
+            charts = None
+        if type(charts) is list and len(charts) == len(messages_batch) and all(type(c) is dict for c in charts):
+            return [json_utils.dumps(chart) for chart in charts]
+        
+        # The combined answer could not be split per prompt, so ask for each chart separately
+        return super()._send(messages_batch, kwargs)
+
+
+# Shared by every agent instance so concurrent build_chart calls coalesce into one request
+_chart_batcher = _ChartSpecBatcher(
+    window_seconds=Config.CHART_BATCH_WINDOW_MS / 1000,
+    max_batch_size=Config.CHART_BATCH_MAX_SIZE
+)
+
+
+# Top-level fields every renderable Vega-Lite spec needs
+_REQUIRED_FIELDS = frozenset({"$schema", "data", "mark", "encoding"})
+
+# Common business metrics and dimensions used for template data
+_METRICS = ("revenue", "sales", "profit", "customers", "orders", "conversion_rate", "satisfaction_score", "churn_rate")
+_DIMENSIONS = ("region", "department", "product", "month", "quarter", "year", "category", "team")
+
+# Template data per dimension: x field, x type, x title, categories, and per metric kind
+# (low, high, chart title). Titles may use {metric} and {dimension} placeholders.
+_DATA_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "month": {
+        "field": "month", "type": "ordinal", "title": "Month",
+        "categories": ("Jan", "Feb", "Mar", "Apr", "May", "Jun"),
+        "churn": (2, 8, "Customer Churn Rate Over Time"),
+        "satisfaction": (3.5, 4.8, "Customer Satisfaction Over Time"),
+        "value": (50000, 200000, "{metric} Over Time")
+    },
+    "region": {
+        "field": "region", "type": "nominal", "title": "Region",
+        "categories": ("North", "South", "East", "West", "Central"),
+        "churn": (2, 12, "Customer Churn Rate by Region"),
+        "satisfaction": (3.2, 4.9, "Customer Satisfaction by Region"),
+        "value": (80000, 250000, "{metric} by Region")
+    },
+    "department": {
+        "field": "department", "type": "nominal", "title": "Department",
+        "categories": ("Sales", "Marketing", "Engineering", "Customer Support", "Finance", "HR"),
+        "churn": (1, 15, "Employee Churn Rate by Department"),
+        "satisfaction": (3.0, 4.7, "Employee Satisfaction by Department"),
+        "value": (50000, 300000, "{metric} by Department")
+    },
+    "product": {
+        "field": "product", "type": "nominal", "title": "Product",
+        "categories": ("Product A", "Product B", "Product C", "Product D", "Product E"),
+        "churn": (3, 18, "Customer Churn Rate by Product"),
+        "satisfaction": (2.8, 4.6, "Customer Satisfaction by Product"),
+        "value": (30000, 200000, "{metric} by Product")
+    },
+    "category": {
+        "field": "category", "type": "nominal", "title": "{dimension}",
+        "categories": ("Category A", "Category B", "Category C", "Category D", "Category E"),
+        "churn": (2, 10, "Churn Rate by {dimension}"),
+        "satisfaction": (3.5, 4.8, "Satisfaction Score by {dimension}"),
+        "value": (40000, 180000, "{metric} by {dimension}")
+    }
+}
+
+# Metric kind → (y field, y title); None uses the metric's own name
+_METRIC_FIELDS = {
+    "churn": ("churn_rate", "Churn Rate (%)"),
+    "satisfaction": ("satisfaction_score", "Satisfaction Score"),
+    "value": ("value", None)
+}
+
+# Query keywords → Vega-Lite mark, in priority order when several appear
+_CHART_TYPE_KEYWORDS = (
+    ("bar", "bar"), ("column", "bar"),
+    ("line", "line"), ("trend", "line"), ("over time", "line"), ("time series", "line"), ("timeline", "line"),
+    ("scatter", "point"), ("point", "point"), ("correlation", "point"),
+    ("pie", "arc"), ("donut", "arc"),
+    ("area", "area"), ("stacked", "area")
+)
+_CHART_TYPE_PRIORITY = {keyword: (rank, mark) for rank, (keyword, mark) in enumerate(_CHART_TYPE_KEYWORDS)}
+
+# Metrics, dimensions and time hints found in one pass over the query
+_TIME_HINTS = ("time", "trend", "timeline")
+_FIELD_RANKS = {
+    **{metric: ("metric", rank) for rank, metric in enumerate(_METRICS)},
+    **{dimension: ("dimension", rank) for rank, dimension in enumerate(_DIMENSIONS)},
+    **{hint: ("time", 0) for hint in _TIME_HINTS}
+}
+
+
+# Shared PCG64 generator for template data values, seeded when CHART_DATA_SEED is set
+_RNG = np.random.default_rng(Config.CHART_DATA_SEED)
+
+
+def _uniform_values(low: float, high: float, count: int) -> list:
+    """Draw count values uniformly from [low, high), rounded to one decimal place."""
+    return _RNG.uniform(low, high, count).round(1).tolist()
+
+
+def _integer_values(low: int, high: int, count: int) -> list:
+    """Draw count integers uniformly from [low, high]."""
+    return _RNG.integers(low, high, count, endpoint=True).tolist()
+
+
+_CHART_TYPE_RE = keyword_re(_CHART_TYPE_PRIORITY)
+_FIELD_RE = keyword_re(_FIELD_RANKS)
+
+
+def _detect_chart_type_keyword(query: str) -> str:
+    """Return the mark for the highest-priority chart-type keyword in a lowercase query, or "bar"."""
+    keywords = _CHART_TYPE_RE.findall(query)
+    return min(_CHART_TYPE_PRIORITY[keyword] for keyword in keywords)[1] if keywords else "bar"
+
+
+def _detect_fields(query: str) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    Find the metric, dimension and time hint named in a lowercase query.
+    
+    When several metrics or dimensions appear, the one listed first in
+    _METRICS or _DIMENSIONS wins.
+    
+    Returns:
+        Tuple[Optional[str], Optional[str], bool]: (metric, dimension, mentions_time)
+    """
+    metric_rank = dimension_rank = len(_FIELD_RANKS)
+    detected_metric = detected_dimension = None
+    mentions_time = False
+    for word in _FIELD_RE.findall(query):
+        kind, rank = _FIELD_RANKS[word]
+        if kind == "metric":
+            if rank < metric_rank:
+                metric_rank, detected_metric = rank, word
+        elif kind == "dimension":
+            if rank < dimension_rank:
+                dimension_rank, detected_dimension = rank, word
+        else:
+            mentions_time = True
+    return detected_metric, detected_dimension, mentions_time
+
+
+# Words that say nothing about the data when judging whether a prompt is trivial
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "me", "my", "our", "show", "showing", "display", "give", "create", "make",
+    "draw", "plot", "chart", "graph", "visualize", "visualise", "of", "for", "per", "by", "in",
+    "on", "and", "with", "across", "please", "i", "want", "see", "to", "what", "is", "are",
+    "how", "over", "series", "vs", "versus", "total", "as"
+})
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_KNOWN_KEYWORD_RE = keyword_re(frozenset(_FIELD_RANKS) | frozenset(_CHART_TYPE_PRIORITY))
+
+# Minimum _classify_triviality confidence for skipping the LLM
+_TRIVIAL_CONFIDENCE = 0.9
+
+# Generation methods whose specs are valid by construction or were validated when cached
+_PREVALIDATED_METHODS = frozenset({"cache", "regex_template", "trivial_template", "dynamic_template"})
+
+# Dimensions the template data encodes under their own name; the rest share a generic "category" axis
+_ENCODED_DIMENSIONS = frozenset(_DATA_TEMPLATES) - {"category"}
+
+# Pattern groups matching exactly one known metric ("conversion rate" may be spelled with a
+# space) or one encoded dimension, so prompts with qualifiers fall through to the LLM
+_METRIC_GROUP = "(?P<metric>" + "|".join(metric.replace("_", "[_ ]") for metric in _METRICS) + ")"
+_DIMENSION_GROUP = "(?P<dimension>" + "|".join(sorted(_ENCODED_DIMENSIONS)) + ")"
+
+# Whole-prompt patterns simple enough to build from templates without an LLM call
+_TEMPLATE_PATTERNS = (
+    (re.compile(
+        r"(?:(?:create|show|make|draw|plot)\s+)?(?:me\s+)?(?:an?\s+)?(?:bar|column)\s+(?:chart|graph)\s+"
+        r"(?:of|showing|for)\s+" + _METRIC_GROUP + r"\s+by\s+" + _DIMENSION_GROUP
+    ), "bar"),
+    (re.compile(
+        r"(?:(?:create|show|make|draw|plot)\s+)?(?:me\s+)?(?:an?\s+)?line\s+(?:chart|graph)\s+"
+        r"(?:of|showing|for)\s+" + _METRIC_GROUP + r"\s+(?:over\s+time|by\s+month)"
+    ), "line"),
+    (re.compile(
+        r"(?:(?:create|show|make|draw|plot)\s+)?(?:me\s+)?(?:an?\s+)?area\s+(?:chart|graph)\s+"
+        r"(?:of|showing|for)\s+" + _METRIC_GROUP + r"\s+(?:over\s+time|by\s+month)"
+    ), "area"),
+    # Bare "<metric> over time" / "<metric> by <dimension>" requests with no chart type named
+    (re.compile(
+        r"(?:(?:show|plot|chart|visualize)\s+)?(?:me\s+)?(?:the\s+|our\s+|my\s+)?"
+        + _METRIC_GROUP + r"\s+(?:over\s+time|trends?|by\s+month)"
+    ), "line"),
+    (re.compile(
+        r"(?:(?:show|plot|chart|visualize|compare)\s+)?(?:me\s+)?(?:the\s+|our\s+|my\s+)?"
+        + _METRIC_GROUP + r"\s+by\s+" + _DIMENSION_GROUP
+    ), "bar"),
+)
+
+# Vega-Lite mark → reported chart type
+_MARK_CHART_TYPES: Dict[str, str] = {
+    "bar": "bar",
+    "line": "line",
+    "point": "scatter",
+    "area": "area",
+    "circle": "scatter",
+    "square": "scatter",
+    "tick": "tick",
+    "rect": "heatmap",
+    "rule": "rule",
+    "text": "text"
+}
+
+# Static fragments _enhance_chart_spec copies into every spec (kept pristine, never spliced in directly)
+_AUTOSIZE = {"type": "fit", "contains": "padding"}
+_COLOR_SCALE = {"scheme": "tableau10"}
+_SELECTION = {
+    "highlight": {"type": "single", "on": "mouseover", "empty": "none"}
+}
+_DEFAULT_TOOLTIP = [
+    {"field": "Region", "type": "nominal", "title": "Region"},
+    {"field": "Sales", "type": "quantitative", "title": "Sales (USD)"}
+]
+_CONFIG = {
+    "bar": {"cornerRadiusEnd": 6},
+    "axis": {"labelFontSize": 13, "titleFontSize": 16},
+    "title": {"fontSize": 20, "fontWeight": "bold"}
+}
+
+# Mock chart spec for testing, shared by every caller (do not mutate)
+_MOCK_CHART_SPEC: Dict[str, Any] = {
+    "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+    "description": "Revenue by region over time",
+    "data": {
+        "values": [
+            {"region": "North", "revenue": 120000, "month": "Jan"},
+            {"region": "South", "revenue": 95000, "month": "Jan"},
+            {"region": "East", "revenue": 110000, "month": "Jan"},
+            {"region": "West", "revenue": 85000, "month": "Jan"},
+            {"region": "North", "revenue": 135000, "month": "Feb"},
+            {"region": "South", "revenue": 105000, "month": "Feb"},
+            {"region": "East", "revenue": 125000, "month": "Feb"},
+            {"region": "West", "revenue": 90000, "month": "Feb"},
+            {"region": "North", "revenue": 150000, "month": "Mar"},
+            {"region": "South", "revenue": 115000, "month": "Mar"},
+            {"region": "East", "revenue": 140000, "month": "Mar"},
+            {"region": "West", "revenue": 100000, "month": "Mar"}
+        ]
+    },
+    "mark": "line",
+    "encoding": {
+        "x": {
+            "field": "month",
+            "type": "ordinal",
+            "title": "Month"
+        },
+        "y": {
+            "field": "revenue",
+            "type": "quantitative",
+            "title": "Revenue ($)"
+        },
+        "color": {
+            "field": "region",
+            "type": "nominal",
+            "title": "Region"
+        }
+    },
+    "title": {
+        "text": "Revenue by Region Over Time",
+        "fontSize": 16
+    },
+    "width": 600,
+    "height": 400
+}
+
+# Maximum number of LLM-generated specs kept per agent for repeated prompts
+_PROMPT_CACHE_SIZE = 512
+
+
+def _prompt_digest(prompt: str) -> bytes:
+    """Hash a prompt for the in-process prompt cache, using xxh3 when available."""
+    if xxhash:
+        return xxhash.xxh3_128_digest(prompt.encode())
+    return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
 
 
 class ChartBuilderAgent:
     """Agent responsible for building chart specifications from prompts."""
     
-    def __init__(self):
+    __slots__ = ("name", "description", "max_concurrency", "_prompt_cache", "_last")
+    
+    def __init__(self, max_concurrency: int = 8):
+        """
+        Args:
+            max_concurrency (int): Maximum LLM requests build_charts_batch keeps in flight
+        """
         self.name = "chart_builder"
         self.description = "Generates Vega-Lite chart specifications from visualization prompts"
+        self.max_concurrency = max_concurrency
+        # prompt digest -> (chart_spec_json, chart_type) for LLM successes, oldest first; hits decode a fresh spec
+        self._prompt_cache: Dict[bytes, tuple] = {}
+        # Single-slot memo for retries that resend the same prompt: ((prompt, user_query), result)
+        # Key and result live in one tuple so concurrent callers never see a mismatched pair
+        self._last: Optional[tuple] = None
     
     def build_chart(self, prompt: str, user_query: str = "") -> Dict[str, Any]:
         """
@@ -32,156 +430,314 @@ class ChartBuilderAgent:
         Returns:
             Dict[str, Any]: Chart specification and metadata
         """
-        # Only use cache for exact matches to avoid generating identical charts
+        key = (prompt, user_query)
+        result = self._replay_last(key)
+        if result is not None:
+            return result
+        
+        result = self._build_chart_without_llm(prompt, user_query)
+        if result is None:
+            # Try LLM-based chart generation with improved prompting
+            llm_response = _chart_batcher.submit(messages=_llm_messages(prompt), **_LLM_ARGS)
+            result = self._chart_from_llm_response(llm_response, prompt, user_query)
+        
+        self._remember(key, result)
+        return result
+    
+    async def build_chart_async(self, prompt: str, user_query: str = "") -> Dict[str, Any]:
+        """
+        Build a chart specification without blocking the event loop.
+        
+        Same tiers as build_chart, but a cache miss streams the response from the
+        async OpenAI client and stops reading once the spec's JSON object closes.
+        
+        Args:
+            prompt (str): Visualization prompt
+            user_query (str): Original user query for cache lookup
+            
+        Returns:
+            Dict[str, Any]: Chart specification and metadata
+        """
+        key = (prompt, user_query)
+        result = self._replay_last(key)
+        if result is not None:
+            return result
+        
+        result = self._build_chart_without_llm(prompt, user_query)
+        if result is None:
+            llm_response = await chat_completion_stream_async(_llm_messages(prompt), **_LLM_ARGS)
+            if len(llm_response) > _OFFLOAD_PARSE_CHARS:
+                # Parsing a very large response would stall every other task on the loop
+                result = await asyncio.to_thread(self._chart_from_llm_response, llm_response, prompt, user_query)
+            else:
+                result = self._chart_from_llm_response(llm_response, prompt, user_query)
+        
+        self._remember(key, result)
+        return result
+    
+    async def build_charts_batch(self, prompts: List[str], user_queries: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Build several charts concurrently, keeping at most max_concurrency LLM requests in flight.
+        
+        Args:
+            prompts (List[str]): Visualization prompts
+            user_queries (Optional[List[str]]): Original user queries, one per prompt
+            
+        Returns:
+            List[Dict[str, Any]]: Chart results in prompt order
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def build(prompt: str, user_query: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.build_chart_async(prompt, user_query)
+        
+        return await asyncio.gather(*(
+            build(prompt, user_query) for prompt, user_query in zip(prompts, user_queries or [""] * len(prompts))
+        ))
+    
+    def _replay_last(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """Return a copy of the last result if it was built for the same prompt and query."""
+        last = self._last
+        if last is None or last[0] != key:
+            return None
+        result = last[1].copy()
+        # Decoded from the JSON, so the replay shares no spec dict with earlier callers
+        result["chart_spec"] = json_utils.loads(result["chart_spec_json"])
+        result["from_cache"] = True
+        result["cache_hit"] = "last_prompt"
+        return result
+    
+    def _remember(self, key: tuple, result: Dict[str, Any]):
+        """Keep a result for _replay_last."""
+        # A failed LLM call should be retried, not replayed
+        if not result.get("llm_fallback"):
+            self._last = (key, result.copy())
+    
+    def _build_chart_without_llm(self, prompt: str, user_query: str) -> Optional[Dict[str, Any]]:
+        """Run the cache and template tiers, returning None when the LLM is needed."""
+        # Prefer exact cache matches, then closely similar learned queries
         if user_query:
-            cached_chart_spec = learning_cache.suggest_chart_spec(user_query)
-            if cached_chart_spec:
-                # Only use cache for exact matches
-                query_hash = learning_cache._hash_query(user_query)
-                if query_hash in learning_cache.patterns["query_patterns"]:
-                    cached_query = learning_cache.patterns["query_patterns"][query_hash]["query"]
-                    if user_query.lower().strip() == cached_query.lower().strip():
-                        print(f"🎯 Using cached chart spec for exact match: {user_query[:50]}...")
-                        # Always enhance cached chart spec before returning
-                        enhanced_spec = self._enhance_chart_spec(cached_chart_spec, user_query)
-                        return {
-                            "chart_spec": enhanced_spec,
-                            "from_cache": True,
-                            "cache_hit": "exact_match",
-                            "generation_method": "cache",
-                            "chart_type": self._detect_chart_type(enhanced_spec)
-                        }
-        
-        # Try LLM-based chart generation with improved prompting
-        system_prompt = (
-            "You are an expert data visualization specialist. Generate valid Vega-Lite JSON chart specifications "
-            "from user prompts. Create realistic, relevant sample data that matches the user's request. "
-            "Return ONLY the Vega-Lite JSON object, no extra text or explanations. "
-            "Ensure the chart is well-styled, responsive, and follows best practices:\n"
-            "- Include appropriate titles and axis labels\n"
-            "- Use meaningful data that matches the request\n"
-            "- Choose the right chart type for the data\n"
-            "- Include proper styling and colors\n"
-            "- Make sure the chart is readable and informative"
-        )
+            exact_match = _exact_cache_lookup(user_query, learning_cache.version)
+            if exact_match:
+                chart_spec_json, chart_type = exact_match
+                print(f"🎯 Using cached chart spec for exact match: {user_query[:50]}...")
+                return {
+                    # Decoded per hit, so callers may mutate their spec without touching the memo
+                    "chart_spec": json_utils.loads(chart_spec_json),
+                    "chart_spec_json": chart_spec_json,
+                    "from_cache": True,
+                    "cache_hit": "exact_match",
+                    "generation_method": "cache",
+                    "chart_type": chart_type
+                }
+            
+            # Fall back to the closest learned query before paying for an LLM call
+            similar_query = learning_cache.find_similar_query(
+                user_query, threshold=Config.SEMANTIC_CACHE_THRESHOLD
+            )
+            similar_spec_json = learning_cache.suggest_chart_spec_json(similar_query) if similar_query else None
+            if similar_spec_json:
+                print(f"🎯 Using cached chart spec for similar query: {user_query[:50]}...")
+                # Enhance a fresh copy, leaving the learned pattern as stored
+                enhanced_spec = self._enhance_chart_spec(json_utils.loads(similar_spec_json), user_query)
+                return {
+                    "chart_spec": enhanced_spec,
+                    "chart_spec_json": json_utils.dumps(enhanced_spec),
+                    "from_cache": True,
+                    "cache_hit": "semantic_match",
+                    "generation_method": "cache",
+                    "chart_type": self._detect_chart_type(enhanced_spec)
+                }
+            
+            # Then specs generated earlier this session from this prompt for a rephrasing of the query
+            session_match = semantic_chart_cache.lookup(user_query, prompt, threshold=Config.SEMANTIC_CACHE_THRESHOLD)
+            if session_match:
+                chart_spec, chart_spec_json = session_match
+                print(f"🎯 Using session chart spec for similar query: {user_query[:50]}...")
+                return {
+                    "chart_spec": chart_spec,
+                    "chart_spec_json": chart_spec_json,
+                    "from_cache": True,
+                    "cache_hit": "semantic_match",
+                    "generation_method": "cache",
+                    "chart_type": self._detect_chart_type(chart_spec)
+                }
         
-        user_message = f"Create a Vega-Lite chart for: {prompt}\n\nGenerate realistic sample data that matches this request and return only the JSON specification."
+        # Simple prompts map straight onto a template, no LLM round-trip needed
+        template_spec = self._try_template_match(prompt)
+        if template_spec:
+            template_spec = self._enhance_chart_spec(template_spec, user_query or prompt)
+            return {
+                "chart_spec": template_spec,
+                "chart_spec_json": json_utils.dumps(template_spec),
+                "from_cache": False,
+                "cache_hit": None,
+                "generation_method": "regex_template",
+                "chart_type": self._detect_chart_type(template_spec)
+            }
         
-        llm_response = chat_completion(
-            messages=[{"role": "user", "content": user_message}],
-            system_prompt=system_prompt,
-            temperature=0.2,  # Lower temperature for more consistent results
-            max_tokens=1500
-        )
+        # Prompts that only name known fields and chart types don't need the LLM either
+        metric, dimension, chart_type, confidence = self._classify_triviality(prompt)
+        if confidence >= _TRIVIAL_CONFIDENCE:
+            trivial_spec = self._spec_for(
+                chart_type, prompt.lower(), f"Template chart for: {prompt.strip()}", metric=metric, dimension=dimension
+            )
+            trivial_spec = self._enhance_chart_spec(trivial_spec, user_query or prompt)
+            return {
+                "chart_spec": trivial_spec,
+                "chart_spec_json": json_utils.dumps(trivial_spec),
+                "from_cache": False,
+                "cache_hit": None,
+                "generation_method": "trivial_template",
+                "chart_type": self._detect_chart_type(trivial_spec)
+            }
+        
+        # Identical prompts earlier in this process reuse the LLM's answer
+        cached = self._prompt_cache.get(_prompt_digest(prompt))
+        if cached:
+            chart_spec_json, chart_type = cached
+            return {
+                "chart_spec": json_utils.loads(chart_spec_json),
+                "chart_spec_json": chart_spec_json,
+                "from_cache": True,
+                "cache_hit": "prompt_match",
+                "generation_method": "cache",
+                "chart_type": chart_type
+            }
+        
+        return None
+    
+    def _chart_from_llm_response(self, llm_response: str, prompt: str, user_query: str) -> Dict[str, Any]:
+        """Parse and enhance an LLM chart response, falling back to a dynamic template."""
+        # Mock, error and pure prose replies carry no spec; skip the parse and its exception
+        if "{" not in llm_response:
+            return self._llm_fallback(prompt, user_query, "no JSON object in LLM response")
         
-        # Try to parse the LLM response as JSON
         try:
-            # Clean the response to extract JSON
-            cleaned_response = self._extract_json_from_response(llm_response)
-            chart_spec = json.loads(cleaned_response)
+            chart_spec = self._parse_json_response(llm_response)
             
             # Validate and enhance the chart spec
             chart_spec = self._enhance_chart_spec(chart_spec, user_query or prompt)
+            chart_spec_json = json_utils.dumps(chart_spec)
+            chart_type = self._detect_chart_type(chart_spec)
+            
+            # Only valid specs are cached, so cache hits can skip validation in run()
+            if self.validate_chart_spec(chart_spec):
+                if len(self._prompt_cache) >= _PROMPT_CACHE_SIZE:
+                    self._prompt_cache.pop(next(iter(self._prompt_cache)), None)
+                self._prompt_cache[_prompt_digest(prompt)] = (chart_spec_json, chart_type)
+                if user_query:
+                    semantic_chart_cache.insert(user_query, prompt, chart_spec_json)
             
             return {
                 "chart_spec": chart_spec,
+                "chart_spec_json": chart_spec_json,
                 "from_cache": False,
                 "cache_hit": None,
                 "generation_method": "llm",
-                "chart_type": self._detect_chart_type(chart_spec)
+                "chart_type": chart_type
             }
         except Exception as e:
-            print(f"⚠️ LLM chart generation failed: {e}")
-            # If LLM fails, generate dynamic mock data based on the query
-            dynamic_spec = self._generate_dynamic_chart_spec(prompt, user_query)
-            return {
-                "chart_spec": dynamic_spec,
-                "from_cache": False,
-                "cache_hit": None,
-                "generation_method": "dynamic_template",
-                "llm_fallback": True,
-                "llm_error": str(e),
-                "chart_type": self._detect_chart_type(dynamic_spec)
-            }
+            return self._llm_fallback(prompt, user_query, str(e))
     
-    def _extract_json_from_response(self, response: str) -> str:
-        """Extract JSON from LLM response, handling common formatting issues."""
-        # Remove markdown code blocks
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
-        
-        if "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
-        
-        # Try to find JSON object
-        start = response.find("{")
-        end = response.rfind("}") + 1
-        if start != -1 and end != -1:
-            return response[start:end]
-        
-        return response.strip()
+    def _llm_fallback(self, prompt: str, user_query: str, error: str) -> Dict[str, Any]:
+        """Build a dynamic template result for an unusable LLM response."""
+        print(f"⚠️ LLM chart generation failed: {error}")
+        # If LLM fails, generate dynamic mock data based on the query
+        dynamic_spec = self._generate_dynamic_chart_spec(prompt, user_query)
+        return {
+            "chart_spec": dynamic_spec,
+            "chart_spec_json": json_utils.dumps(dynamic_spec),
+            "from_cache": False,
+            "cache_hit": None,
+            "generation_method": "dynamic_template",
+            "llm_fallback": True,
+            "llm_error": error,
+            "chart_type": self._detect_chart_type(dynamic_spec)
+        }
+    
+    def _parse_json_response(self, response: str) -> Dict[str, Any]:
+        """
+        Parse the chart spec out of an LLM response, handling common formatting issues.
+        
+        Args:
+            response (str): Raw LLM response
+            
+        Returns:
+            Dict[str, Any]: Parsed JSON object
+            
+        Raises:
+            ValueError: If the response contains no JSON object
+        """
+        # Unwrap a markdown code block if the model added one
+        fenced = _CODE_FENCE_RE.search(response)
+        text = fenced.group(1) if fenced else response
+        
+        start = text.find("{")
+        if start == -1:
+            raise ValueError("no JSON object in LLM response")
+        
+        # JSON mode normally returns just the object, which the fast parser handles directly
+        if start == 0:
+            try:
+                return json_utils.loads(text)
+            except json_utils.JSONDecodeError:
+                pass
+        
+        # Otherwise decode the first object and ignore any prose after it
+        chart_spec, _ = json_utils.raw_decode(text, start)
+        return chart_spec
     
-    def _enhance_chart_spec(self, chart_spec: Dict[str, Any], user_query: str) -> Dict[str, Any]:
-        """Enhance a chart specification with modern, interactive, and responsive features."""
+    @staticmethod
+    def _enhance_chart_spec(chart_spec: Dict[str, Any], user_query: str) -> Dict[str, Any]:
+        """
+        Enhance a chart specification with modern, interactive, and responsive features.
+        
+        The autosize, color scale, selection, tooltip and config blocks are copied
+        from module constants, so callers may freely edit the returned spec.
+        """
         # Ensure required fields
         if "$schema" not in chart_spec:
             chart_spec["$schema"] = "https://vega.github.io/schema/vega-lite/v5.json"
         # Responsive sizing
-        chart_spec["autosize"] = {"type": "fit", "contains": "padding"}
+        chart_spec["autosize"] = dict(_AUTOSIZE)
         chart_spec["width"] = "container"
         chart_spec["height"] = "container"
         # Modern color scheme
         encoding = chart_spec.get("encoding", {})
         if "color" in encoding:
-            if "scale" not in encoding["color"]:
-                encoding["color"]["scale"] = {"scheme": "tableau10"}
-            else:
-                encoding["color"]["scale"]["scheme"] = "tableau10"
+            scale = encoding["color"].get("scale")
+            if scale is None:
+                encoding["color"]["scale"] = dict(_COLOR_SCALE)
+            elif scale.get("scheme") != "tableau10":
+                scale["scheme"] = "tableau10"
         else:
-            encoding["color"] = {"field": "Region", "type": "nominal", "scale": {"scheme": "tableau10"}}
+            encoding["color"] = {"field": "Region", "type": "nominal", "scale": dict(_COLOR_SCALE)}
         # Bar corner radius and mark enhancements
-        if "mark" in chart_spec:
-            if isinstance(chart_spec["mark"], dict):
-                chart_spec["mark"]["cornerRadiusEnd"] = 6
-                chart_spec["mark"]["tooltip"] = True
-            elif isinstance(chart_spec["mark"], str) and chart_spec["mark"] == "bar":
-                chart_spec["mark"] = {"type": "bar", "cornerRadiusEnd": 6, "tooltip": True}
+        mark = chart_spec.get("mark")
+        if type(mark) is dict:
+            mark["cornerRadiusEnd"] = 6
+            mark["tooltip"] = True
+        elif mark == "bar":
+            chart_spec["mark"] = {"type": "bar", "cornerRadiusEnd": 6, "tooltip": True}
         # Add selection interactivity
-        chart_spec["selection"] = {
-            "highlight": {"type": "single", "on": "mouseover", "empty": "none"}
-        }
+        chart_spec["selection"] = {name: dict(sel) for name, sel in _SELECTION.items()}
         # Richer tooltips
-        encoding["tooltip"] = [
-            {"field": "Region", "type": "nominal", "title": "Region"},
-            {"field": "Sales", "type": "quantitative", "title": "Sales (USD)"}
-        ]
-        # Clean axis titles (remove redundant 'title' at the same level as 'field')
-        for axis in ["x", "y"]:
-            if axis in encoding:
-                if "title" in encoding[axis]:
-                    # If axis.title exists, keep only axis.title
-                    if "axis" in encoding[axis] and "title" in encoding[axis]["axis"]:
-                        encoding[axis]["title"] = encoding[axis]["axis"]["title"]
-                    # Remove redundant axis.title if both exist
-                    if "axis" in encoding[axis] and "title" in encoding[axis]:
-                        encoding[axis]["axis"]["title"] = encoding[axis]["title"]
-                        del encoding[axis]["title"]
+        encoding["tooltip"] = [dict(field) for field in _DEFAULT_TOOLTIP]
+        # Clean axis titles: keep one title per axis, preferring axis.title over the channel title
+        for axis in ("x", "y"):
+            channel = encoding.get(axis)
+            if channel and "title" in channel and type(channel.get("axis")) is dict:
+                title = channel.pop("title")
+                channel["axis"].setdefault("title", title)
         chart_spec["encoding"] = encoding
         # Modern config
-        chart_spec["config"] = {
-            "bar": {"cornerRadiusEnd": 6},
-            "axis": {"labelFontSize": 13, "titleFontSize": 16},
-            "title": {"fontSize": 20, "fontWeight": "bold"}
-        }
+        chart_spec["config"] = {name: dict(block) for name, block in _CONFIG.items()}
         return chart_spec
     
-    def _detect_chart_type(self, chart_spec: Dict[str, Any]) -> str:
+    @staticmethod
+    def _detect_chart_type(chart_spec: Dict[str, Any]) -> str:
         """
         Detect the type of chart from the specification.
         
@@ -192,23 +748,11 @@ class ChartBuilderAgent:
             str: Chart type (bar, line, scatter, etc.)
         """
         mark = chart_spec.get("mark", "")
-        if isinstance(mark, dict):
+        if type(mark) is dict:
             mark = mark.get("type", "")
         
-        chart_types = {
-            "bar": "bar",
-            "line": "line", 
-            "point": "scatter",
-            "area": "area",
-            "circle": "scatter",
-            "square": "scatter",
-            "tick": "tick",
-            "rect": "heatmap",
-            "rule": "rule",
-            "text": "text"
-        }
-        
-        return chart_types.get(mark.lower(), "unknown")
+        # Vega-Lite mark names are case-sensitive lowercase, so no normalisation is needed
+        return _MARK_CHART_TYPES.get(mark, "unknown")
     
     def _generate_dynamic_chart_spec(self, prompt: str, user_query: str = "") -> Dict[str, Any]:
         """
@@ -225,25 +769,96 @@ class ChartBuilderAgent:
         query_lower = (user_query or prompt).lower()
         
         # Determine chart type based on keywords
-        if any(word in query_lower for word in ["bar", "column"]):
-            chart_type = "bar"
-        elif any(word in query_lower for word in ["line", "trend", "over time", "time series"]):
-            chart_type = "line"
-        elif any(word in query_lower for word in ["scatter", "point", "correlation"]):
-            chart_type = "point"
-        elif any(word in query_lower for word in ["pie", "donut"]):
-            chart_type = "arc"
-        elif any(word in query_lower for word in ["area", "stacked"]):
-            chart_type = "area"
-        else:
-            chart_type = "bar"  # Default to bar chart
+        chart_type = _detect_chart_type_keyword(query_lower)
+        
+        return self._spec_for(chart_type, query_lower, f"Dynamic chart for: {user_query or prompt}")
+    
+    def _classify_triviality(self, text: str) -> Tuple[Optional[str], Optional[str], str, float]:
+        """
+        Decide whether a prompt is simple enough to answer from templates.
+        
+        Confidence is the share of meaningful words that are known metric, dimension,
+        time or chart-type keywords. Like the regex templates, it is 0.0 unless exactly
+        one metric is named together with either one dimension the template data
+        encodes or a time hint; a dimension other than month plus a time hint needs
+        the LLM to chart both.
+        
+        Args:
+            text (str): Prompt to classify
+            
+        Returns:
+            Tuple[Optional[str], Optional[str], str, float]: (metric, dimension, chart_type, confidence),
+            where dimension is "month" for time-only prompts
+        """
+        query_lower = text.lower()
+        chart_type = _detect_chart_type_keyword(query_lower)
+        metrics, dimensions, mentions_time = set(), set(), False
+        for word in _FIELD_RE.findall(query_lower):
+            kind = _FIELD_RANKS[word][0]
+            if kind == "metric":
+                metrics.add(word)
+            elif kind == "dimension":
+                dimensions.add(word)
+            else:
+                mentions_time = True
+        metric = next(iter(metrics)) if len(metrics) == 1 else None
+        dimension = next(iter(dimensions)) if len(dimensions) == 1 else None
+        if (
+            metric is None
+            or len(dimensions) > 1
+            or (dimension is None and not mentions_time)
+            or (dimension is not None and dimension not in _ENCODED_DIMENSIONS)
+            or (mentions_time and dimension not in (None, "month"))
+        ):
+            return metric, dimension, chart_type, 0.0
+        
+        words = [word for word in _WORD_RE.findall(query_lower) if word not in _FILLER_WORDS]
+        explained = sum(1 for word in words if _KNOWN_KEYWORD_RE.fullmatch(word))
+        return metric, dimension or "month", chart_type, explained / len(words)
+    
+    def _try_template_match(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Build a chart directly when the whole prompt matches a known simple pattern.
+        
+        Args:
+            prompt (str): Visualization prompt
+            
+        Returns:
+            Optional[Dict[str, Any]]: Template Vega-Lite specification, or None if no pattern matches
+        """
+        query_lower = prompt.strip().lower().rstrip(".!?")
+        for pattern, chart_type in _TEMPLATE_PATTERNS:
+            match = pattern.fullmatch(query_lower)
+            if not match:
+                continue
+            # The spec is built from exactly the matched fields; time-based patterns chart by month
+            metric = match.group("metric").replace(" ", "_")
+            dimension = match.groupdict().get("dimension") or "month"
+            return self._spec_for(
+                chart_type, query_lower, f"Template chart for: {prompt.strip()}", metric=metric, dimension=dimension
+            )
+        return None
+    
+    def _spec_for(self, chart_type: str, query: str, description: str,
+                  metric: Optional[str] = None, dimension: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Assemble a Vega-Lite specification with generated data for a chart type.
         
-        # Generate appropriate data based on query content
-        data, encoding, title = self._generate_dynamic_data(query_lower, chart_type)
+        Args:
+            chart_type (str): Vega-Lite mark to use
+            query (str): User query (lowercase) used to pick metric and dimension
+            description (str): Chart description
+            metric (Optional[str]): Metric to chart instead of the one detected in the query
+            dimension (Optional[str]): Dimension to chart by, used together with metric
+            
+        Returns:
+            Dict[str, Any]: Vega-Lite specification
+        """
+        data, encoding, title = self._generate_dynamic_data(query, chart_type, metric, dimension)
         
-        chart_spec = {
+        return {
             "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "description": f"Dynamic chart for: {user_query or prompt}",
+            "description": description,
             "data": {
                 "values": data
             },
@@ -256,37 +871,26 @@ class ChartBuilderAgent:
             "width": 600,
             "height": 400
         }
-        
-        return chart_spec
     
-    def _generate_dynamic_data(self, query: str, chart_type: str) -> tuple:
+    def _generate_dynamic_data(self, query: str, chart_type: str,
+                               metric: Optional[str] = None, dimension: Optional[str] = None) -> tuple:
         """
         Generate dynamic data based on the query content.
         
         Args:
             query (str): User query (lowercase)
             chart_type (str): Type of chart to generate
+            metric (Optional[str]): Metric already identified by the caller; detected from the query if None
+            dimension (Optional[str]): Dimension already identified by the caller, used together with metric
             
         Returns:
             tuple: (data, encoding, title)
         """
-        # Common business metrics and dimensions
-        metrics = ["revenue", "sales", "profit", "customers", "orders", "conversion_rate", "satisfaction_score", "churn_rate"]
-        dimensions = ["region", "department", "product", "month", "quarter", "year", "category", "team"]
-        
-        # Determine what the user is asking about
-        detected_metric = None
-        detected_dimension = None
-        
-        for metric in metrics:
-            if metric in query:
-                detected_metric = metric
-                break
-        
-        for dimension in dimensions:
-            if dimension in query:
-                detected_dimension = dimension
-                break
+        # Determine what the user is asking about, unless the caller already knows
+        if metric:
+            detected_metric, detected_dimension, mentions_time = metric, dimension, False
+        else:
+            detected_metric, detected_dimension, mentions_time = _detect_fields(query)
         
         # Default values if not detected
         if not detected_metric:
@@ -294,217 +898,53 @@ class ChartBuilderAgent:
         if not detected_dimension:
             detected_dimension = "region"
         
-        # Generate appropriate data based on the detected fields
-        if detected_dimension == "month" or "time" in query or "trend" in query:
-            return self._generate_time_series_data(detected_metric, chart_type)
-        elif detected_dimension == "region":
-            return self._generate_regional_data(detected_metric, chart_type)
-        elif detected_dimension == "department":
-            return self._generate_department_data(detected_metric, chart_type)
-        elif detected_dimension == "product":
-            return self._generate_product_data(detected_metric, chart_type)
+        # Pick the data template for the detected fields
+        if detected_dimension == "month" or mentions_time:
+            template = _DATA_TEMPLATES["month"]
         else:
-            return self._generate_generic_data(detected_metric, detected_dimension, chart_type)
-    
-    def _generate_time_series_data(self, metric: str, chart_type: str) -> tuple:
-        """Generate time series data."""
-        months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        
-        if "churn" in metric:
-            data = [{"month": month, "churn_rate": round(random.uniform(2, 8), 1)} for month in months[:6]]
-            encoding = {
-                "x": {"field": "month", "type": "ordinal", "title": "Month"},
-                "y": {"field": "churn_rate", "type": "quantitative", "title": "Churn Rate (%)"}
-            }
-            title = "Customer Churn Rate Over Time"
-        elif "satisfaction" in metric:
-            data = [{"month": month, "satisfaction_score": round(random.uniform(3.5, 4.8), 1)} for month in months[:6]]
-            encoding = {
-                "x": {"field": "month", "type": "ordinal", "title": "Month"},
-                "y": {"field": "satisfaction_score", "type": "quantitative", "title": "Satisfaction Score"}
-            }
-            title = "Customer Satisfaction Over Time"
-        else:
-            data = [{"month": month, "value": random.randint(50000, 200000)} for month in months[:6]]
-            encoding = {
-                "x": {"field": "month", "type": "ordinal", "title": "Month"},
-                "y": {"field": "value", "type": "quantitative", "title": metric.title()}
-            }
-            title = f"{metric.title()} Over Time"
+            template = _DATA_TEMPLATES.get(detected_dimension, _DATA_TEMPLATES["category"])
         
-        return data, encoding, title
-    
-    def _generate_regional_data(self, metric: str, chart_type: str) -> tuple:
-        """Generate regional data."""
-        regions = ["North", "South", "East", "West", "Central"]
-        
-        if "churn" in metric:
-            data = [{"region": region, "churn_rate": round(random.uniform(2, 12), 1)} for region in regions]
-            encoding = {
-                "x": {"field": "region", "type": "nominal", "title": "Region"},
-                "y": {"field": "churn_rate", "type": "quantitative", "title": "Churn Rate (%)"}
-            }
-            title = "Customer Churn Rate by Region"
-        elif "satisfaction" in metric:
-            data = [{"region": region, "satisfaction_score": round(random.uniform(3.2, 4.9), 1)} for region in regions]
-            encoding = {
-                "x": {"field": "region", "type": "nominal", "title": "Region"},
-                "y": {"field": "satisfaction_score", "type": "quantitative", "title": "Satisfaction Score"}
-            }
-            title = "Customer Satisfaction by Region"
+        if "churn" in detected_metric:
+            metric_kind = "churn"
+        elif "satisfaction" in detected_metric:
+            metric_kind = "satisfaction"
         else:
-            data = [{"region": region, "value": random.randint(80000, 250000)} for region in regions]
-            encoding = {
-                "x": {"field": "region", "type": "nominal", "title": "Region"},
-                "y": {"field": "value", "type": "quantitative", "title": metric.title()}
-            }
-            title = f"{metric.title()} by Region"
+            metric_kind = "value"
+        low, high, title_format = template[metric_kind]
+        y_field, y_title = _METRIC_FIELDS[metric_kind]
         
-        return data, encoding, title
-    
-    def _generate_department_data(self, metric: str, chart_type: str) -> tuple:
-        """Generate department data."""
-        departments = ["Sales", "Marketing", "Engineering", "Customer Support", "Finance", "HR"]
-        
-        if "churn" in metric:
-            data = [{"department": dept, "churn_rate": round(random.uniform(1, 15), 1)} for dept in departments]
-            encoding = {
-                "x": {"field": "department", "type": "nominal", "title": "Department"},
-                "y": {"field": "churn_rate", "type": "quantitative", "title": "Churn Rate (%)"}
-            }
-            title = "Employee Churn Rate by Department"
-        elif "satisfaction" in metric:
-            data = [{"department": dept, "satisfaction_score": round(random.uniform(3.0, 4.7), 1)} for dept in departments]
-            encoding = {
-                "x": {"field": "department", "type": "nominal", "title": "Department"},
-                "y": {"field": "satisfaction_score", "type": "quantitative", "title": "Satisfaction Score"}
-            }
-            title = "Employee Satisfaction by Department"
-        else:
-            data = [{"department": dept, "value": random.randint(50000, 300000)} for dept in departments]
-            encoding = {
-                "x": {"field": "department", "type": "nominal", "title": "Department"},
-                "y": {"field": "value", "type": "quantitative", "title": metric.title()}
-            }
-            title = f"{metric.title()} by Department"
-        
-        return data, encoding, title
-    
-    def _generate_product_data(self, metric: str, chart_type: str) -> tuple:
-        """Generate product data."""
-        products = ["Product A", "Product B", "Product C", "Product D", "Product E"]
-        
-        if "churn" in metric:
-            data = [{"product": product, "churn_rate": round(random.uniform(3, 18), 1)} for product in products]
-            encoding = {
-                "x": {"field": "product", "type": "nominal", "title": "Product"},
-                "y": {"field": "churn_rate", "type": "quantitative", "title": "Churn Rate (%)"}
-            }
-            title = "Customer Churn Rate by Product"
-        elif "satisfaction" in metric:
-            data = [{"product": product, "satisfaction_score": round(random.uniform(2.8, 4.6), 1)} for product in products]
-            encoding = {
-                "x": {"field": "product", "type": "nominal", "title": "Product"},
-                "y": {"field": "satisfaction_score", "type": "quantitative", "title": "Satisfaction Score"}
-            }
-            title = "Customer Satisfaction by Product"
+        field, categories = template["field"], template["categories"]
+        if metric_kind == "value":
+            values = _integer_values(low, high, len(categories))
         else:
-            data = [{"product": product, "value": random.randint(30000, 200000)} for product in products]
-            encoding = {
-                "x": {"field": "product", "type": "nominal", "title": "Product"},
-                "y": {"field": "value", "type": "quantitative", "title": metric.title()}
-            }
-            title = f"{metric.title()} by Product"
+            values = _uniform_values(low, high, len(categories))
+        data = [{field: category, y_field: value} for category, value in zip(categories, values)]
         
-        return data, encoding, title
-    
-    def _generate_generic_data(self, metric: str, dimension: str, chart_type: str) -> tuple:
-        """Generate generic data for any metric/dimension combination."""
-        categories = ["Category A", "Category B", "Category C", "Category D", "Category E"]
-        
-        if "churn" in metric:
-            data = [{"category": cat, "churn_rate": round(random.uniform(2, 10), 1)} for cat in categories]
-            encoding = {
-                "x": {"field": "category", "type": "nominal", "title": dimension.title()},
-                "y": {"field": "churn_rate", "type": "quantitative", "title": "Churn Rate (%)"}
-            }
-            title = f"Churn Rate by {dimension.title()}"
-        elif "satisfaction" in metric:
-            data = [{"category": cat, "satisfaction_score": round(random.uniform(3.5, 4.8), 1)} for cat in categories]
-            encoding = {
-                "x": {"field": "category", "type": "nominal", "title": dimension.title()},
-                "y": {"field": "satisfaction_score", "type": "quantitative", "title": "Satisfaction Score"}
-            }
-            title = f"Satisfaction Score by {dimension.title()}"
-        else:
-            data = [{"category": cat, "value": random.randint(40000, 180000)} for cat in categories]
-            encoding = {
-                "x": {"field": "category", "type": "nominal", "title": dimension.title()},
-                "y": {"field": "value", "type": "quantitative", "title": metric.title()}
-            }
-            title = f"{metric.title()} by {dimension.title()}"
+        metric_title, dimension_title = detected_metric.title(), detected_dimension.title()
+        encoding = {
+            "x": {"field": field, "type": template["type"], "title": template["title"].format(dimension=dimension_title)},
+            "y": {"field": y_field, "type": "quantitative", "title": y_title or metric_title}
+        }
+        title = title_format.format(metric=metric_title, dimension=dimension_title)
         
         return data, encoding, title
     
-    def _generate_mock_chart_spec(self, prompt: str) -> Dict[str, Any]:
+    def _generate_mock_chart_spec(self, prompt: str, mutable: bool = False) -> Dict[str, Any]:
         """
         Generate a mock Vega-Lite chart specification for testing.
         
+        The spec does not depend on the prompt, so a single shared instance is
+        returned by default. Callers must not mutate it; pass mutable=True to
+        get a private deep copy instead.
+        
         Args:
             prompt (str): Original prompt (used for context)
+            mutable (bool): Return a deep copy the caller may modify
             
         Returns:
             Dict[str, Any]: Mock Vega-Lite specification
         """
-        # Mock data for testing
-        mock_data = [
-            {"region": "North", "revenue": 120000, "month": "Jan"},
-            {"region": "South", "revenue": 95000, "month": "Jan"},
-            {"region": "East", "revenue": 110000, "month": "Jan"},
-            {"region": "West", "revenue": 85000, "month": "Jan"},
-            {"region": "North", "revenue": 135000, "month": "Feb"},
-            {"region": "South", "revenue": 105000, "month": "Feb"},
-            {"region": "East", "revenue": 125000, "month": "Feb"},
-            {"region": "West", "revenue": 90000, "month": "Feb"},
-            {"region": "North", "revenue": 150000, "month": "Mar"},
-            {"region": "South", "revenue": 115000, "month": "Mar"},
-            {"region": "East", "revenue": 140000, "month": "Mar"},
-            {"region": "West", "revenue": 100000, "month": "Mar"}
-        ]
-        
-        chart_spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "description": "Revenue by region over time",
-            "data": {
-                "values": mock_data
-            },
-            "mark": "line",
-            "encoding": {
-                "x": {
-                    "field": "month",
-                    "type": "ordinal",
-                    "title": "Month"
-                },
-                "y": {
-                    "field": "revenue",
-                    "type": "quantitative",
-                    "title": "Revenue ($)"
-                },
-                "color": {
-                    "field": "region",
-                    "type": "nominal",
-                    "title": "Region"
-                }
-            },
-            "title": {
-                "text": "Revenue by Region Over Time",
-                "fontSize": 16
-            },
-            "width": 600,
-            "height": 400
-        }
-        
-        return chart_spec
+        return copy.deepcopy(_MOCK_CHART_SPEC) if mutable else _MOCK_CHART_SPEC
     
     def validate_chart_spec(self, chart_spec: Dict[str, Any]) -> bool:
         """
@@ -516,13 +956,8 @@ class ChartBuilderAgent:
         Returns:
             bool: True if valid, False otherwise
         """
-        required_fields = ["$schema", "data", "mark", "encoding"]
-        
-        for field in required_fields:
-            if field not in chart_spec:
-                return False
-        
-        return True
+        # dict_keys >= set probes only the four required keys instead of copying the spec's keys
+        return chart_spec.keys() >= _REQUIRED_FIELDS
     
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -540,35 +975,98 @@ class ChartBuilderAgent:
         if not prompt:
             raise ValueError("prompt is required in state")
         
-        chart_result = self.build_chart(prompt, user_query)
+        return self._updated_state(state, self.build_chart(prompt, user_query))
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async counterpart of run() for callers on an event loop.
         
-        # Validate the chart specification
-        is_valid = self.validate_chart_spec(chart_result["chart_spec"])
+        Args:
+            state (Dict[str, Any]): Current state containing prompt
+            
+        Returns:
+            Dict[str, Any]: Updated state with chart specification
+        """
+        prompt = state.get("prompt", "")
+        user_query = state.get("user_query", "")
         
-        return {
-            **state,
+        if not prompt:
+            raise ValueError("prompt is required in state")
+        
+        return self._updated_state(state, await self.build_chart_async(prompt, user_query))
+    
+    def _updated_state(self, state: Dict[str, Any], chart_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge a build_chart result into a copy of the pipeline state."""
+        # Cached and template specs are known-good; only validate fresh LLM output
+        if chart_result["generation_method"] in _PREVALIDATED_METHODS:
+            is_valid = True
+        else:
+            is_valid = chart_result["chart_spec"].keys() >= _REQUIRED_FIELDS
+        
+        # build_chart serialises each spec once, or reuses the cached JSON
+        chart_spec_json = chart_result["chart_spec_json"]
+        
+        # Build the agent output once; top-level state fields share its values.
+        # The pre-encoded JSON sits alongside the spec, so consumers need not re-encode it.
+        chart_builder_output = {
             "chart_spec": chart_result["chart_spec"],
-            "chart_spec_json": json.dumps(chart_result["chart_spec"]),
-            "chart_valid": is_valid,
-            "chart_from_cache": chart_result["from_cache"],
-            "chart_cache_hit": chart_result["cache_hit"],
-            "chart_generation_method": chart_result["generation_method"],
+            "chart_spec_json": chart_spec_json,
             "chart_type": chart_result["chart_type"],
-            "agent_outputs": {
-                **state.get("agent_outputs", {}),
-                "chart_builder": {
-                    "chart_spec": chart_result["chart_spec"],
-                    "chart_type": chart_result["chart_type"],
-                    "from_cache": chart_result["from_cache"],
-                    "cache_hit": chart_result["cache_hit"],
-                    "generation_method": chart_result["generation_method"],
-                    "is_valid": is_valid,
-                    "status": "completed",
-                    "llm_fallback": chart_result.get("llm_fallback", False),
-                    "llm_error": chart_result.get("llm_error", None)
-                }
-            }
+            "from_cache": chart_result["from_cache"],
+            "cache_hit": chart_result["cache_hit"],
+            "generation_method": chart_result["generation_method"],
+            "is_valid": is_valid,
+            "status": "completed",
+            "llm_fallback": chart_result.get("llm_fallback", False),
+            "llm_error": chart_result.get("llm_error", None)
         }
+        
+        # Copy once and assign in place rather than re-hashing state through ** unpacking
+        agent_outputs = state.get("agent_outputs", {}).copy()
+        agent_outputs["chart_builder"] = chart_builder_output
+        
+        new_state = state.copy()
+        new_state["chart_spec"] = chart_result["chart_spec"]
+        new_state["chart_spec_json"] = chart_spec_json
+        new_state["chart_valid"] = is_valid
+        new_state["chart_from_cache"] = chart_builder_output["from_cache"]
+        new_state["chart_cache_hit"] = chart_builder_output["cache_hit"]
+        new_state["chart_generation_method"] = chart_builder_output["generation_method"]
+        new_state["chart_type"] = chart_builder_output["chart_type"]
+        new_state["agent_outputs"] = agent_outputs
+        return new_state
+
+
+@functools.lru_cache(maxsize=512)
+def _exact_cache_lookup(user_query: str, cache_version: int) -> Optional[tuple]:
+    """
+    Look up and enhance the learned chart spec for an exact user query match.
+    
+    Keyed on learning_cache.version as well, so any newly learned or cleared
+    pattern makes older entries unreachable and they age out of the LRU. Only the
+    immutable JSON is memoised; callers decode a fresh spec from it.
+    
+    Args:
+        user_query (str): Original user query
+        cache_version (int): Current learning_cache.version
+        
+    Returns:
+        Optional[tuple]: (enhanced spec JSON, chart_type), or None without an exact match
+    """
+    # Hash once and probe the pattern tables directly
+    query_hash = learning_cache._hash_query(user_query)
+    if not learning_cache.patterns["chart_patterns"].get(query_hash):
+        return None
+    
+    # Equal hashes already imply equal lowercased queries; this only guards against collisions
+    query_pattern = learning_cache.patterns["query_patterns"].get(query_hash)
+    if not query_pattern or user_query.lower() != query_pattern["query"].lower():
+        return None
+    
+    # Always enhance cached chart spec before returning, on a decoded copy so the learned pattern stays as stored
+    cached_chart_spec = json_utils.loads(learning_cache.suggest_chart_spec_json(user_query))
+    enhanced_spec = ChartBuilderAgent._enhance_chart_spec(cached_chart_spec, user_query)
+    return json_utils.dumps(enhanced_spec), ChartBuilderAgent._detect_chart_type(enhanced_spec)
 
 
 # Example usage
@@ -578,4 +1076,4 @@ if __name__ == "__main__":
         "prompt": "Create a chart showing revenue by region over time"
     }
     result = agent.run(test_state)
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json_utils.dumps(result, indent=True))
\ No newline at end of file
@@ -8,27 +8,97 @@ Input: original_user_query (string)
 Output: clarified_query (string) or follow_up_question (string)
 """
 
-from typing import Dict, Any, Tuple, Optional
+from types import MappingProxyType
+from typing import Dict, Any, ClassVar, FrozenSet, List, Mapping, Tuple, Optional
+import functools
 import json
+import operator
+import re
+import numpy as np
+from text_utils import keyword_re
+
+
+def _bitmask(term_bits: Mapping[str, int], terms: FrozenSet[str]) -> int:
+    """Combine the bits of the given terms into one integer mask."""
+    return functools.reduce(operator.or_, (term_bits[term] for term in terms), 0)
 
 
 class ClarifierAgent:
     """Agent responsible for clarifying vague or unrenderable user queries."""
     
-    def __init__(self):
+    # Keywords per signal the clarifier looks for
+    _VAGUE_TERMS: ClassVar[FrozenSet[str]] = frozenset({"business", "performance", "metrics", "data", "results"})
+    _BUSINESS_METRIC_TERMS: ClassVar[FrozenSet[str]] = frozenset({"revenue", "profit", "sales", "customers", "orders", "growth"})
+    _TIME_TERMS: ClassVar[FrozenSet[str]] = frozenset({"time", "trend", "over time", "period", "month", "year", "quarter", "week"})
+    _DIMENSION_TERMS: ClassVar[FrozenSet[str]] = frozenset({"by", "region", "product", "department", "category", "group"})
+    _BROAD_TERMS: ClassVar[FrozenSet[str]] = frozenset({"everything", "all", "overview", "summary", "general"})
+    _AMBIGUOUS_TERMS: ClassVar[FrozenSet[str]] = frozenset({"performance", "results", "numbers", "figures", "statistics"})
+    _AGGREGATE_TERMS: ClassVar[FrozenSet[str]] = frozenset({"total", "average", "percentage", "count", "sum", "mean"})
+    
+    # Finds every keyword above in a single pass over the query
+    _KEYWORD_RE: ClassVar[re.Pattern[str]] = keyword_re(
+        _VAGUE_TERMS | _BUSINESS_METRIC_TERMS | _TIME_TERMS | _DIMENSION_TERMS
+        | _BROAD_TERMS | _AMBIGUOUS_TERMS | _AGGREGATE_TERMS
+    )
+    
+    # One bit per keyword, so analyze_queries can classify a batch with integer masks
+    _TERM_BITS: ClassVar[Mapping[str, int]] = MappingProxyType({
+        term: 1 << bit
+        for bit, term in enumerate(sorted(
+            _VAGUE_TERMS | _BUSINESS_METRIC_TERMS | _TIME_TERMS | _DIMENSION_TERMS
+            | _BROAD_TERMS | _AMBIGUOUS_TERMS | _AGGREGATE_TERMS
+        ))
+    })
+    _VAGUE_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _VAGUE_TERMS)
+    _BUSINESS_METRIC_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _BUSINESS_METRIC_TERMS)
+    _TIME_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _TIME_TERMS)
+    _DIMENSION_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _DIMENSION_TERMS)
+    _BROAD_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _BROAD_TERMS)
+    _AMBIGUOUS_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _AMBIGUOUS_TERMS)
+    _AGGREGATE_MASK: ClassVar[int] = _bitmask(_TERM_BITS, _AGGREGATE_TERMS)
+    
+    # Follow-up question for each clarification type, shared read-only by all instances
+    _CLARIFICATION_PATTERNS: ClassVar[Mapping[str, str]] = MappingProxyType({
+        "vague_business": "What specific business metrics would you like to see? (e.g., revenue, profit, sales, customers)",
+        "missing_timeframe": "What time period would you like to analyze? (e.g., last month, Q1 2024, past year)",
+        "missing_dimensions": "What dimensions would you like to compare? (e.g., by region, product, department)",
+        "missing_chart_type": "What type of visualization would you prefer? (e.g., bar chart, line chart, pie chart)",
+        "missing_data_source": "What data source should I use for this analysis?",
+        "too_broad": "Could you be more specific about what you'd like to visualize?",
+        "ambiguous_metrics": "Which specific metrics are you interested in? (e.g., total, average, percentage change)"
+    })
+    
+    # Query-specific framing around the base question ({base}) and original query ({q})
+    _QUESTION_TEMPLATES: ClassVar[Mapping[str, str]] = MappingProxyType({
+        "vague_business": "I see you want to analyze your business. {base}",
+        "missing_timeframe": "For your query about '{q}', {base}",
+        "missing_dimensions": "To better visualize '{q}', {base}",
+        "too_broad": "Your request is quite broad. {base}",
+        "ambiguous_metrics": "Regarding '{q}', {base}"
+    })
+    
+    # Improved query suggestions, built around the original query ({q})
+    _SUGGESTION_TEMPLATES: ClassVar[Mapping[str, str]] = MappingProxyType({
+        "vague_business": "Show me revenue trends over the last 12 months",
+        "missing_timeframe": "{q} over the last quarter",
+        "missing_dimensions": "{q} by region",
+        "too_broad": "Show me monthly revenue by product category",
+        "ambiguous_metrics": "Show me total {q} by month"
+    })
+    
+    # (question template, suggestion template) per type, so run() dispatches once
+    _RESPONSE_TEMPLATES: ClassVar[Mapping[str, Tuple[str, str]]] = MappingProxyType(dict(zip(
+        _QUESTION_TEMPLATES,
+        zip(_QUESTION_TEMPLATES.values(), map(_SUGGESTION_TEMPLATES.__getitem__, _QUESTION_TEMPLATES))
+    )))
+    
+    __slots__ = ("name", "description")
+    name: str
+    description: str
+    
+    def __init__(self) -> None:
         self.name = "clarifier"
         self.description = "Clarifies vague or unrenderable user queries through follow-up questions"
-        
-        # Common clarification patterns
-        self.clarification_patterns = {
-            "vague_business": "What specific business metrics would you like to see? (e.g., revenue, profit, sales, customers)",
-            "missing_timeframe": "What time period would you like to analyze? (e.g., last month, Q1 2024, past year)",
-            "missing_dimensions": "What dimensions would you like to compare? (e.g., by region, product, department)",
-            "missing_chart_type": "What type of visualization would you prefer? (e.g., bar chart, line chart, pie chart)",
-            "missing_data_source": "What data source should I use for this analysis?",
-            "too_broad": "Could you be more specific about what you'd like to visualize?",
-            "ambiguous_metrics": "Which specific metrics are you interested in? (e.g., total, average, percentage change)"
-        }
     
     def analyze_query(self, user_query: str) -> Tuple[str, Optional[str]]:
         """
@@ -40,65 +110,105 @@ class ClarifierAgent:
         Returns:
             Tuple[str, Optional[str]]: Clarification type and follow-up question
         """
-        query_lower = user_query.lower()
+        # Repeated queries are common in chat traffic, so the analysis is cached per normalized query
+        return self._analyze_normalized(user_query.strip().lower())
+    
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def _analyze_normalized(cls, query_lower: str) -> Tuple[str, Optional[str]]:
+        """Analyze a stripped, lowercased query; results are shared immutable tuples."""
+        # Find every keyword once; the checks below are set operations on the result
+        terms = frozenset(cls._KEYWORD_RE.findall(query_lower))
         
         # Check for vague business queries
-        if self._is_vague_business_query(query_lower):
-            return "vague_business", self.clarification_patterns["vague_business"]
+        if cls._is_vague_business_query(terms):
+            return "vague_business", cls._CLARIFICATION_PATTERNS["vague_business"]
         
         # Check for missing timeframe
-        if self._is_missing_timeframe(query_lower):
-            return "missing_timeframe", self.clarification_patterns["missing_timeframe"]
+        if cls._is_missing_timeframe(terms):
+            return "missing_timeframe", cls._CLARIFICATION_PATTERNS["missing_timeframe"]
         
         # Check for missing dimensions
-        if self._is_missing_dimensions(query_lower):
-            return "missing_dimensions", self.clarification_patterns["missing_dimensions"]
+        if cls._is_missing_dimensions(terms):
+            return "missing_dimensions", cls._CLARIFICATION_PATTERNS["missing_dimensions"]
         
         # Check for too broad queries
-        if self._is_too_broad(query_lower):
-            return "too_broad", self.clarification_patterns["too_broad"]
+        if cls._is_too_broad(terms):
+            return "too_broad", cls._CLARIFICATION_PATTERNS["too_broad"]
         
         # Check for ambiguous metrics
-        if self._is_ambiguous_metrics(query_lower):
-            return "ambiguous_metrics", self.clarification_patterns["ambiguous_metrics"]
+        if cls._is_ambiguous_metrics(terms):
+            return "ambiguous_metrics", cls._CLARIFICATION_PATTERNS["ambiguous_metrics"]
         
         # If no specific issues found, return None
         return "clear", None
     
-    def _is_vague_business_query(self, query: str) -> bool:
-        """Check if query is too vague about business metrics."""
-        vague_terms = ["business", "performance", "metrics", "data", "results"]
-        specific_terms = ["revenue", "profit", "sales", "customers", "orders", "growth"]
+    @classmethod
+    def analyze_queries(cls, user_queries: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Analyze many user queries at once, with the same rules as analyze_query.
+        
+        Each query is reduced to a bitmask of the keywords it contains, and the
+        clarification checks then run as vectorized integer ANDs over the batch.
+        
+        Args:
+            user_queries (List[str]): Original user queries
+            
+        Returns:
+            List[Tuple[str, Optional[str]]]: Clarification type and follow-up question per query
+        """
+        term_bits = cls._TERM_BITS
+        find_terms = cls._KEYWORD_RE.findall
+        masks = np.fromiter(
+            (_bitmask(term_bits, frozenset(find_terms(query.lower()))) for query in user_queries),
+            dtype=np.uint64,
+            count=len(user_queries)
+        )
         
-        has_vague = any(term in query for term in vague_terms)
-        has_specific = any(term in query for term in specific_terms)
+        def has_any(mask: int) -> np.ndarray:
+            return (masks & np.uint64(mask)) != 0
         
-        return has_vague and not has_specific
+        # Checks in analyze_query's order; np.select picks the first that holds
+        checks = [
+            has_any(cls._VAGUE_MASK) & ~has_any(cls._BUSINESS_METRIC_MASK),
+            ~has_any(cls._TIME_MASK),
+            ~has_any(cls._DIMENSION_MASK),
+            has_any(cls._BROAD_MASK),
+            has_any(cls._AMBIGUOUS_MASK) & ~has_any(cls._AGGREGATE_MASK)
+        ]
+        outcomes = [
+            (clarification_type, cls._CLARIFICATION_PATTERNS[clarification_type])
+            for clarification_type in ("vague_business", "missing_timeframe", "missing_dimensions", "too_broad", "ambiguous_metrics")
+        ]
+        outcomes.append(("clear", None))
+        
+        choices = np.select(checks, range(len(checks)), default=len(checks))
+        return [outcomes[choice] for choice in choices.tolist()]
+    
+    @classmethod
+    def _is_vague_business_query(cls, terms: FrozenSet[str]) -> bool:
+        """Check if query is too vague about business metrics."""
+        return not cls._VAGUE_TERMS.isdisjoint(terms) and cls._BUSINESS_METRIC_TERMS.isdisjoint(terms)
     
-    def _is_missing_timeframe(self, query: str) -> bool:
+    @classmethod
+    def _is_missing_timeframe(cls, terms: FrozenSet[str]) -> bool:
         """Check if query is missing timeframe information."""
-        time_terms = ["time", "trend", "over time", "period", "month", "year", "quarter", "week"]
-        return not any(term in query for term in time_terms)
+        return cls._TIME_TERMS.isdisjoint(terms)
     
-    def _is_missing_dimensions(self, query: str) -> bool:
+    @classmethod
+    def _is_missing_dimensions(cls, terms: FrozenSet[str]) -> bool:
         """Check if query is missing dimension information."""
-        dimension_terms = ["by", "region", "product", "department", "category", "group"]
-        return not any(term in query for term in dimension_terms)
+        return cls._DIMENSION_TERMS.isdisjoint(terms)
     
-    def _is_too_broad(self, query: str) -> bool:
+    @classmethod
+    def _is_too_broad(cls, terms: FrozenSet[str]) -> bool:
         """Check if query is too broad or generic."""
-        broad_terms = ["everything", "all", "overview", "summary", "general"]
-        return any(term in query for term in broad_terms)
+        return not cls._BROAD_TERMS.isdisjoint(terms)
     
-    def _is_ambiguous_metrics(self, query: str) -> bool:
+    @classmethod
+    def _is_ambiguous_metrics(cls, terms: FrozenSet[str]) -> bool:
         """Check if query has ambiguous metric specifications."""
-        ambiguous_terms = ["performance", "results", "numbers", "figures", "statistics"]
-        specific_terms = ["total", "average", "percentage", "count", "sum", "mean"]
-        
-        has_ambiguous = any(term in query for term in ambiguous_terms)
-        has_specific = any(term in query for term in specific_terms)
-        
-        return has_ambiguous and not has_specific
+        return not cls._AMBIGUOUS_TERMS.isdisjoint(terms) and cls._AGGREGATE_TERMS.isdisjoint(terms)
     
     def generate_clarification_question(self, clarification_type: str, original_query: str) -> str:
         """
@@ -111,26 +221,10 @@ class ClarifierAgent:
         Returns:
             str: Follow-up question
         """
-        base_question = self.clarification_patterns.get(clarification_type, "Could you provide more details?")
-        
-        # Customize question based on original query
-        if clarification_type == "vague_business":
-            return f"I see you want to analyze your business. {base_question}"
-        
-        elif clarification_type == "missing_timeframe":
-            return f"For your query about '{original_query}', {base_question}"
-        
-        elif clarification_type == "missing_dimensions":
-            return f"To better visualize '{original_query}', {base_question}"
-        
-        elif clarification_type == "too_broad":
-            return f"Your request is quite broad. {base_question}"
-        
-        elif clarification_type == "ambiguous_metrics":
-            return f"Regarding '{original_query}', {base_question}"
+        base_question = self._CLARIFICATION_PATTERNS.get(clarification_type, "Could you provide more details?")
         
-        else:
-            return base_question
+        template = self._QUESTION_TEMPLATES.get(clarification_type)
+        return template.format(base=base_question, q=original_query) if template else base_question
     
     def suggest_improved_query(self, original_query: str, clarification_type: str) -> str:
         """
@@ -143,15 +237,33 @@ class ClarifierAgent:
         Returns:
             str: Suggested improved query
         """
-        suggestions = {
-            "vague_business": "Show me revenue trends over the last 12 months",
-            "missing_timeframe": f"{original_query} over the last quarter",
-            "missing_dimensions": f"{original_query} by region",
-            "too_broad": "Show me monthly revenue by product category",
-            "ambiguous_metrics": f"Show me total {original_query} by month"
-        }
+        template = self._SUGGESTION_TEMPLATES.get(clarification_type)
+        return template.format(q=original_query) if template else original_query
+    
+    def _analyze_and_respond(self, user_query: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        Classify the query and build its clarification question and suggested query in one pass.
+        
+        Args:
+            user_query (str): Original user query
+            
+        Returns:
+            Tuple[str, Optional[str], Optional[str]]: Clarification type, question and
+            suggested query; the last two are None when the query is clear
+        """
+        clarification_type, base_question = self.analyze_query(user_query)
+        if base_question is None:
+            return clarification_type, None, None
         
-        return suggestions.get(clarification_type, original_query)
+        templates = self._RESPONSE_TEMPLATES.get(clarification_type)
+        if templates is None:
+            return clarification_type, base_question, user_query
+        question_template, suggestion_template = templates
+        return (
+            clarification_type,
+            question_template.format(base=base_question, q=user_query),
+            suggestion_template.format(q=user_query)
+        )
     
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -168,14 +280,11 @@ class ClarifierAgent:
         if not user_query:
             raise ValueError("user_query is required in state")
         
-        # Analyze the query
-        clarification_type, follow_up_question = self.analyze_query(user_query)
+        # Analyze the query and build the follow-up in one pass
+        clarification_type, clarification_question, suggested_query = self._analyze_and_respond(user_query)
         
-        # Generate clarification question if needed
-        if follow_up_question:
-            clarification_question = self.generate_clarification_question(clarification_type, user_query)
-            suggested_query = self.suggest_improved_query(user_query, clarification_type)
-            
+        # Return the clarification question if needed
+        if clarification_question:
             return {
                 **state,
                 "clarification_needed": True,
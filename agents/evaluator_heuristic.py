@@ -9,32 +9,91 @@ Output: score (0-10), issue_tags (list of strings)
 
 from typing import Dict, Any, List, Tuple
 import json
+import numpy as np
+
+
+# Top-level fields every renderable Vega-Lite spec needs
+_REQUIRED_FIELDS = frozenset({"$schema", "data", "mark", "encoding"})
+
+# Plain-language explanation per issue tag, used in the detailed feedback
+_ISSUE_EXPLANATIONS = {
+    "missing_title": "No chart title provided",
+    "missing_axis_labels": "Axis labels are missing",
+    "invalid_chart_type": "Chart type is not recognized",
+    "missing_data": "No data values found",
+    "missing_encoding": "Data encoding is incomplete",
+    "missing_styling": "Chart dimensions not specified"
+}
+
+# Feedback per criterion: (excellent, partial threshold, partial, missing). Criteria
+# without a partial level repeat the missing text. Templates may use {chart_type}.
+_FEEDBACK_TEMPLATES = {
+    "has_title": (
+        "✅ **Chart Title**: Excellent - The chart has a clear, descriptive title that helps users understand what they're looking at.",
+        0.7,
+        "⚠️ **Chart Title**: Good - The chart has a title, but it could be more descriptive or specific.",
+        "❌ **Chart Title**: Missing - Charts should have titles to provide context. Consider adding a descriptive title."
+    ),
+    "has_axis_labels": (
+        "✅ **Axis Labels**: Excellent - Both X and Y axes have clear labels explaining what the data represents.",
+        0.5,
+        "⚠️ **Axis Labels**: Partial - Only one axis has a label. Both axes should be labeled for clarity.",
+        "❌ **Axis Labels**: Missing - Axis labels help users understand what the data represents. Add labels to both axes."
+    ),
+    "appropriate_chart_type": (
+        "✅ **Chart Type**: Excellent - The chart type ({chart_type}) is appropriate for the data and request.",
+        1.0,
+        "❌ **Chart Type**: Invalid - The chart type may not be suitable. Consider using bar, line, point, area, or other standard chart types.",
+        "❌ **Chart Type**: Invalid - The chart type may not be suitable. Consider using bar, line, point, area, or other standard chart types."
+    ),
+    "has_data": (
+        "✅ **Data Structure**: Excellent - The chart has properly structured data with values to visualize.",
+        1.0,
+        "❌ **Data Structure**: Missing - Charts need data to visualize. Ensure the chart specification includes data values.",
+        "❌ **Data Structure**: Missing - Charts need data to visualize. Ensure the chart specification includes data values."
+    ),
+    "proper_encoding": (
+        "✅ **Data Encoding**: Excellent - The chart properly encodes data with appropriate X and Y mappings.",
+        0.5,
+        "⚠️ **Data Encoding**: Partial - Only one axis is properly encoded. Both X and Y should map to data fields.",
+        "❌ **Data Encoding**: Missing - Charts need to encode data on both axes. Add proper X and Y field mappings."
+    ),
+    "good_styling": (
+        "✅ **Visual Styling**: Excellent - The chart has appropriate width and height for good readability.",
+        0.5,
+        "⚠️ **Visual Styling**: Partial - The chart has some styling but could benefit from explicit dimensions.",
+        "❌ **Visual Styling**: Missing - Add width and height to ensure the chart displays properly."
+    ),
+    "responsive_design": (
+        "✅ **Responsive Design**: Excellent - The chart is designed to adapt to different screen sizes.",
+        1.0,
+        "⚠️ **Responsive Design**: Could be improved - Consider adding autosize properties for better responsiveness.",
+        "⚠️ **Responsive Design**: Could be improved - Consider adding autosize properties for better responsiveness."
+    )
+}
 
 
 class HeuristicEvaluatorAgent:
     """Agent responsible for rule-based evaluation of chart specifications."""
     
+    # Expanded set of valid Vega-Lite marks
+    _VALID_MARKS = frozenset({
+        "bar", "line", "point", "area", "circle", "square", "tick", "rect", "rule", "arc", "text", "geoshape", "trail", "boxplot", "errorband", "errorbar"
+    })
+    
+    __slots__ = ("name", "description")
+    
     def __init__(self):
         self.name = "heuristic_evaluator"
         self.description = "Performs rule-based evaluation of chart specifications"
-        
-        # Define evaluation criteria
-        self.criteria = {
-            "has_title": {"weight": 0.1, "required": True},
-            "has_axis_labels": {"weight": 0.15, "required": True},
-            "appropriate_chart_type": {"weight": 0.2, "required": True},
-            "has_data": {"weight": 0.15, "required": True},
-            "proper_encoding": {"weight": 0.2, "required": True},
-            "good_styling": {"weight": 0.1, "required": False},
-            "responsive_design": {"weight": 0.1, "required": False}
-        }
     
-    def evaluate_chart(self, chart_spec: Dict[str, Any]) -> Dict[str, Any]:
+    def evaluate_chart(self, chart_spec: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
         """
         Evaluate a chart specification using heuristic rules.
         
         Args:
             chart_spec (Dict[str, Any]): Vega-Lite chart specification
+            verbose (bool): Build the educational detailed_feedback text; otherwise it is None
             
         Returns:
             Dict[str, Any]: Detailed evaluation results
@@ -56,48 +115,38 @@ class HeuristicEvaluatorAgent:
             }
         
         # Evaluate each criterion
-        for criterion, config in self.criteria.items():
-            criterion_score, criterion_issues = self._evaluate_criterion(
-                criterion, chart_spec, config
-            )
-            
-            # Debug: check for non-string issues
-            for issue in criterion_issues:
-                if not isinstance(issue, str):
-                    print(f"[DEBUG] Non-string issue detected in criterion '{criterion}': {issue} (type: {type(issue)})")
+        for criterion, weight, required, evaluate in self._EVALUATORS:
+            criterion_score, criterion_issues = evaluate(self, chart_spec)
             
             criterion_scores[criterion] = criterion_score
             criterion_details[criterion] = {
                 "score": criterion_score,
-                "issues": [str(issue) for issue in criterion_issues],
-                "weight": config["weight"],
-                "required": config["required"],
-                "weighted_score": criterion_score * config["weight"]
+                "issues": criterion_issues,
+                "weight": weight,
+                "required": required,
+                "weighted_score": criterion_score * weight
             }
             
-            if criterion_score == 0 and config["required"]:
-                issues.extend([str(issue) for issue in criterion_issues])
-                if "invalid_input" in [str(issue) for issue in criterion_issues]:
-                    return {
-                        "score": 0.0,
-                        "issues": [str(i) for i in criterion_issues],
-                        "criterion_scores": criterion_scores,
-                        "criterion_details": criterion_details,
-                        "chart_valid": False,
-                        "detailed_feedback": f"Critical issue with {criterion}: {', '.join([str(i) for i in criterion_issues])}"
-                    }
+            # A required criterion failing on invalid input sinks the whole chart
+            if criterion_score == 0 and required and "invalid_input" in criterion_issues:
+                return {
+                    "score": 0.0,
+                    "issues": list(criterion_issues),
+                    "criterion_scores": criterion_scores,
+                    "criterion_details": criterion_details,
+                    "chart_valid": False,
+                    "detailed_feedback": f"Critical issue with {criterion}: {', '.join(criterion_issues)}"
+                }
             
-            score += criterion_score * config["weight"]
-            issues.extend([str(issue) for issue in criterion_issues])
+            score += criterion_score * weight
+            issues.extend(criterion_issues)
         
-        # Generate detailed feedback
-        detailed_feedback = self._generate_detailed_feedback(criterion_details, issues)
+        # Generate detailed feedback only for callers that show it
+        detailed_feedback = self._generate_detailed_feedback(criterion_details, issues) if verbose else None
         
-        # Only keep string issues for deduplication
-        string_issues = [i for i in issues if isinstance(i, str)]
         return {
             "score": min(score * 10, 10.0),
-            "issues": list(set(string_issues)),  # Remove duplicates, only strings
+            "issues": list(dict.fromkeys(issues)),  # Remove duplicates, keeping first-seen order
             "criterion_scores": criterion_scores,
             "criterion_details": criterion_details,
             "chart_valid": True,
@@ -106,36 +155,34 @@ class HeuristicEvaluatorAgent:
             "detailed_feedback": detailed_feedback
         }
     
-    def _is_valid_chart_spec(self, chart_spec: Dict[str, Any]) -> bool:
-        """Check if chart specification has basic required structure."""
-        if not isinstance(chart_spec, dict):
-            return False
+    def score_charts(self, chart_specs: List[Dict[str, Any]]) -> List[float]:
+        """
+        Score many chart specifications at once, without issues or feedback.
+        
+        Per-criterion scores are collected into one matrix and weighted with a
+        single matrix-vector product, for batch workflows that only need the number.
         
-        required_fields = ["$schema", "data", "mark", "encoding"]
-        return all(field in chart_spec for field in required_fields)
+        Args:
+            chart_specs (List[Dict[str, Any]]): Vega-Lite chart specifications
+            
+        Returns:
+            List[float]: Score (0-10) per chart, on the same scale as evaluate_chart
+        """
+        evaluators = [criterion[3] for criterion in self._EVALUATORS]
+        scores = np.zeros((len(chart_specs), len(evaluators)))
+        for row, chart_spec in enumerate(chart_specs):
+            if self._is_valid_chart_spec(chart_spec):
+                scores[row] = [evaluate(self, chart_spec)[0] for evaluate in evaluators]
+        return np.minimum(scores @ self._WEIGHTS * 10, 10.0).tolist()
     
-    def _evaluate_criterion(self, criterion: str, chart_spec: Dict[str, Any], config: Dict[str, Any]) -> Tuple[float, List[str]]:
-        """Evaluate a specific criterion."""
-        if criterion == "has_title":
-            return self._evaluate_title(chart_spec)
-        elif criterion == "has_axis_labels":
-            return self._evaluate_axis_labels(chart_spec)
-        elif criterion == "appropriate_chart_type":
-            return self._evaluate_chart_type(chart_spec)
-        elif criterion == "has_data":
-            return self._evaluate_data(chart_spec)
-        elif criterion == "proper_encoding":
-            return self._evaluate_encoding(chart_spec)
-        elif criterion == "good_styling":
-            return self._evaluate_styling(chart_spec)
-        elif criterion == "responsive_design":
-            return self._evaluate_responsive_design(chart_spec)
-        else:
-            return 0.0, [f"unknown_criterion_{criterion}"]
+    def _is_valid_chart_spec(self, chart_spec: Dict[str, Any]) -> bool:
+        """Check if chart specification has basic required structure."""
+        # dict_keys >= set probes the four required keys in C, stopping at the first missing one
+        return isinstance(chart_spec, dict) and chart_spec.keys() >= _REQUIRED_FIELDS
     
     def _evaluate_title(self, chart_spec: Dict[str, Any]) -> Tuple[float, List[str]]:
         """Evaluate if chart has a proper title."""
-        title = chart_spec.get("title", {})
+        title = chart_spec.get("title")
         if isinstance(title, dict) and title.get("text"):
             return 1.0, []
         elif isinstance(title, str) and title.strip():
@@ -145,9 +192,12 @@ class HeuristicEvaluatorAgent:
     
     def _evaluate_axis_labels(self, chart_spec: Dict[str, Any]) -> Tuple[float, List[str]]:
         """Evaluate if chart has proper axis labels."""
-        encoding = chart_spec.get("encoding", {})
-        x_has_title = encoding.get("x", {}).get("title") is not None
-        y_has_title = encoding.get("y", {}).get("title") is not None
+        # Plain .get and None checks, so no throwaway default dicts are built
+        encoding = chart_spec.get("encoding") or {}
+        x_encoding = encoding.get("x")
+        y_encoding = encoding.get("y")
+        x_has_title = x_encoding is not None and x_encoding.get("title") is not None
+        y_has_title = y_encoding is not None and y_encoding.get("title") is not None
         
         if x_has_title and y_has_title:
             return 1.0, []
@@ -164,26 +214,23 @@ class HeuristicEvaluatorAgent:
             mark_type = mark.get("type", "")
         else:
             mark_type = mark
-        # Expanded list of valid Vega-Lite marks
-        valid_marks = [
-            "bar", "line", "point", "area", "circle", "square", "tick", "rect", "rule", "arc", "text", "geoshape", "trail", "boxplot", "errorband", "errorbar"
-        ]
-        if mark_type in valid_marks:
+        if mark_type in self._VALID_MARKS:
             return 1.0, []
         else:
             return 0.0, [f"invalid_chart_type: {mark_type}"]
     
     def _evaluate_data(self, chart_spec: Dict[str, Any]) -> Tuple[float, List[str]]:
         """Evaluate if chart has proper data structure."""
-        data = chart_spec.get("data", {})
-        if "values" in data and isinstance(data["values"], list) and len(data["values"]) > 0:
+        data = chart_spec.get("data")
+        values = data.get("values") if isinstance(data, dict) else None
+        if isinstance(values, list) and values:
             return 1.0, []
         else:
             return 0.0, ["missing_data"]
     
     def _evaluate_encoding(self, chart_spec: Dict[str, Any]) -> Tuple[float, List[str]]:
         """Evaluate if chart has proper encoding."""
-        encoding = chart_spec.get("encoding", {})
+        encoding = chart_spec.get("encoding")
         
         if not encoding:
             return 0.0, ["missing_encoding"]
@@ -229,87 +276,46 @@ class HeuristicEvaluatorAgent:
         # Otherwise, not responsive
         return 0.0, ["not_responsive"]
     
+    # Evaluation criteria in report order: (name, weight, required, evaluator)
+    _EVALUATORS = (
+        ("has_title", 0.1, True, _evaluate_title),
+        ("has_axis_labels", 0.15, True, _evaluate_axis_labels),
+        ("appropriate_chart_type", 0.2, True, _evaluate_chart_type),
+        ("has_data", 0.15, True, _evaluate_data),
+        ("proper_encoding", 0.2, True, _evaluate_encoding),
+        ("good_styling", 0.1, False, _evaluate_styling),
+        ("responsive_design", 0.1, False, _evaluate_responsive_design)
+    )
+    
+    # Criterion weights in _EVALUATORS order, so score_charts can weight a batch in one product
+    _WEIGHTS = np.array([criterion[1] for criterion in _EVALUATORS], dtype=np.float64)
+    
     def _generate_detailed_feedback(self, criterion_details: Dict[str, Any], issues: List[str]) -> str:
         """Generate detailed feedback about the evaluation."""
         feedback_parts = []
+        append = feedback_parts.append
+        chart_type_name = self._get_chart_type_name(criterion_details)
         
         for criterion, details in criterion_details.items():
             score = details["score"]
             criterion_issues = details["issues"]
-            weight = details["weight"]
             
             # Create educational feedback for each criterion
-            if criterion == "has_title":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Chart Title**: Excellent - The chart has a clear, descriptive title that helps users understand what they're looking at.")
-                elif score >= 0.7:
-                    feedback_parts.append(f"⚠️ **Chart Title**: Good - The chart has a title, but it could be more descriptive or specific.")
-                else:
-                    feedback_parts.append(f"❌ **Chart Title**: Missing - Charts should have titles to provide context. Consider adding a descriptive title.")
-            
-            elif criterion == "has_axis_labels":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Axis Labels**: Excellent - Both X and Y axes have clear labels explaining what the data represents.")
-                elif score >= 0.5:
-                    feedback_parts.append(f"⚠️ **Axis Labels**: Partial - Only one axis has a label. Both axes should be labeled for clarity.")
-                else:
-                    feedback_parts.append(f"❌ **Axis Labels**: Missing - Axis labels help users understand what the data represents. Add labels to both axes.")
-            
-            elif criterion == "appropriate_chart_type":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Chart Type**: Excellent - The chart type ({self._get_chart_type_name(criterion_details)}) is appropriate for the data and request.")
-                else:
-                    feedback_parts.append(f"❌ **Chart Type**: Invalid - The chart type may not be suitable. Consider using bar, line, point, area, or other standard chart types.")
-            
-            elif criterion == "has_data":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Data Structure**: Excellent - The chart has properly structured data with values to visualize.")
-                else:
-                    feedback_parts.append(f"❌ **Data Structure**: Missing - Charts need data to visualize. Ensure the chart specification includes data values.")
-            
-            elif criterion == "proper_encoding":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Data Encoding**: Excellent - The chart properly encodes data with appropriate X and Y mappings.")
-                elif score >= 0.5:
-                    feedback_parts.append(f"⚠️ **Data Encoding**: Partial - Only one axis is properly encoded. Both X and Y should map to data fields.")
-                else:
-                    feedback_parts.append(f"❌ **Data Encoding**: Missing - Charts need to encode data on both axes. Add proper X and Y field mappings.")
-            
-            elif criterion == "good_styling":
-                if score == 1.0:
-                    feedback_parts.append(f"✅ **Visual Styling**: Excellent - The chart has appropriate width and height for good readability.")
-                elif score >= 0.5:
-                    feedback_parts.append(f"⚠️ **Visual Styling**: Partial - The chart has some styling but could benefit from explicit dimensions.")
-                else:
-                    feedback_parts.append(f"❌ **Visual Styling**: Missing - Add width and height to ensure the chart displays properly.")
-            
-            elif criterion == "responsive_design":
+            templates = _FEEDBACK_TEMPLATES.get(criterion)
+            if templates:
+                excellent, partial_threshold, partial, missing = templates
                 if score == 1.0:
-                    feedback_parts.append(f"✅ **Responsive Design**: Excellent - The chart is designed to adapt to different screen sizes.")
+                    template = excellent
+                elif score >= partial_threshold:
+                    template = partial
                 else:
-                    feedback_parts.append(f"⚠️ **Responsive Design**: Could be improved - Consider adding autosize properties for better responsiveness.")
+                    template = missing
+                append(template.format(chart_type=chart_type_name))
             
             # Add specific issues if any
             if criterion_issues:
-                issue_explanations = []
-                for issue in criterion_issues:
-                    if issue == "missing_title":
-                        issue_explanations.append("No chart title provided")
-                    elif issue == "missing_axis_labels":
-                        issue_explanations.append("Axis labels are missing")
-                    elif issue == "invalid_chart_type":
-                        issue_explanations.append("Chart type is not recognized")
-                    elif issue == "missing_data":
-                        issue_explanations.append("No data values found")
-                    elif issue == "missing_encoding":
-                        issue_explanations.append("Data encoding is incomplete")
-                    elif issue == "missing_styling":
-                        issue_explanations.append("Chart dimensions not specified")
-                    else:
-                        issue_explanations.append(issue)
-                
-                if issue_explanations:
-                    feedback_parts.append(f"   **Issues**: {', '.join(issue_explanations)}")
+                issue_explanations = [_ISSUE_EXPLANATIONS.get(issue, issue) for issue in criterion_issues]
+                append(f"   **Issues**: {', '.join(issue_explanations)}")
         
         return " | ".join(feedback_parts)
     
@@ -333,7 +339,7 @@ class HeuristicEvaluatorAgent:
         if not chart_spec:
             raise ValueError("chart_spec is required in state")
         
-        evaluation_results = self.evaluate_chart(chart_spec)
+        evaluation_results = self.evaluate_chart(chart_spec, verbose=True)
         
         # Determine if clarifier should be triggered
         should_clarify = evaluation_results["score"] == 0 and "invalid_input" in evaluation_results["issues"]
@@ -7,18 +7,510 @@ Input: chart_spec (Dict), original_intent (string)
 Output: score (0-10), feedback (string rationale)
 """
 
-from typing import Dict, Any, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import asyncio
+import copy
+import hashlib
+import itertools
 import json
-from llm_utils import chat_completion
+import re
+import sys
+import threading
+import numpy as np
+from config import Config
+import json_utils
+from llm_utils import chat_completion, chat_completion_async, chat_completion_batch
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+# Instructions for the LLM judge, identical on every call
+_SYSTEM_PROMPT = (
+    "Rate 0-10 how well a Vega-Lite chart fulfills the user intent: chart-type fit, clarity, insight, aesthetics. "
+    "Reward tooltips, selection, responsive sizing, modern palettes and clear, non-redundant axis titles; "
+    "ignore minor axis title flaws in an otherwise clear chart. "
+    "Reply with a JSON object: score (number), feedback (string), strengths and weaknesses (string arrays)."
+)
+_TEMPERATURE = 0.0  # Greedy decoding, so a cached verdict is the one a fresh call would give
+_DEFAULT_FEEDBACK = "No feedback provided."
+_MAX_TOKENS = 220
+
+# Constrain replies to the verdict schema where the model supports it, so they always parse;
+# otherwise JSON mode still guarantees a JSON object
+_VERDICT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"},
+        "feedback": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["score", "feedback", "strengths", "weaknesses"]
+}
+if Config.CHART_JSON_SCHEMA:
+    _RESPONSE_FORMAT: Dict[str, Any] = {
+        "type": "json_schema",
+        "json_schema": {"name": "chart_evaluation", "schema": _VERDICT_SCHEMA, "strict": False}
+    }
+else:
+    _RESPONSE_FORMAT = {"type": "json_object"}
+
+# The system prompt is sent first and verbatim on every call, so it forms a stable prefix;
+# the cache key routes all evaluator requests to the same provider-side prefix cache
+_PROMPT_CACHE_KEY = "promptsmith-llm-evaluator"
+
+# A batch of evaluations goes out as one request listing every chart; the verdicts come back
+# wrapped in an object, since JSON mode only returns objects
+_COMBINED_PREFIX = "Evaluate each numbered chart below against its user intent.\n\n"
+_COMBINED_SUFFIX = (
+    '\n\nReturn a JSON object of the form {"evaluations": [...]} with one verdict per chart, '
+    "in chart order. Number of charts: "
+)
+_COMBINED_FORMAT = {"type": "json_object"}
+
+# Completion token limit of the default model, which caps a combined request
+_MAX_COMBINED_TOKENS = 4096
+
+# Single LLM calls run here so the caller can prepare the fallback and bound the wait
+_llm_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-evaluator")
+
+# Parsed LLM evaluations by request payload digest, least recently used evicted first.
+# The judge decodes greedily, so a repeated request reuses the earlier verdict.
+_RESPONSE_CACHE_SIZE = 512
+_response_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+# Optional on-disk tier shared by every worker process and kept across restarts; verdicts
+# expire after a day so prompt or model changes eventually take effect
+_DISK_CACHE_SIZE_LIMIT = 2 ** 30
+_DISK_CACHE_EXPIRE_SECONDS = 86400
+_disk_cache = (
+    diskcache.Cache(Config.EVALUATOR_CACHE_DIR, size_limit=_DISK_CACHE_SIZE_LIMIT)
+    if diskcache and Config.EVALUATOR_CACHE_DIR else None
+)
+
+
+# Verdicts per exact chart spec and normalised intent, so an intent differing only in case,
+# spacing or punctuation reuses the verdict. Reworded intents can be judged differently.
+_intent_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_INTENT_NOISE_RE = re.compile(r"[^\w\s]+")
+
+
+def _canonical_json(chart_spec: Dict[str, Any]) -> str:
+    """Compact JSON with sorted keys, so equal specs always serialise identically."""
+    return json_utils.dumps(chart_spec, sort_keys=True)
+
+
+def _spec_fingerprint(spec_json: str) -> str:
+    """SHA-256 digest of a chart spec's canonical JSON."""
+    return hashlib.sha256(spec_json.encode()).hexdigest()
+
+
+def _normalize_intent(original_intent: str) -> str:
+    """Lowercase an intent, drop its punctuation and collapse its whitespace."""
+    return " ".join(_INTENT_NOISE_RE.sub(" ", original_intent.lower()).split())
+
+
+def _equivalent_evaluation(spec_fingerprint: str, original_intent: str) -> Optional[Dict[str, Any]]:
+    """Return a deep copy of the verdict for the same spec and an equivalent earlier intent, or None."""
+    key = (spec_fingerprint, _normalize_intent(original_intent))
+    with _response_cache_lock:
+        result = _intent_cache.get(key)
+        if result is None:
+            return None
+        _intent_cache.move_to_end(key)
+    return copy.deepcopy(result)
+
+
+def _store_equivalent_evaluation(spec_fingerprint: str, original_intent: str, result: Dict[str, Any]):
+    """Remember a copy of a verdict for equivalent intents, evicting the least recently used entry when full."""
+    key = (spec_fingerprint, _normalize_intent(original_intent))
+    result = copy.deepcopy(result)
+    with _response_cache_lock:
+        _intent_cache[key] = result
+        _intent_cache.move_to_end(key)
+        if len(_intent_cache) > _RESPONSE_CACHE_SIZE:
+            _intent_cache.popitem(last=False)
+
+
+def _payload_key(system_prompt: str, user_message: str, temperature: float, max_tokens: int) -> str:
+    """SHA-256 digest of everything that determines the LLM's answer."""
+    # Hashed as plain text rather than re-serialised, as the message already holds the spec JSON.
+    # Only the last field is free text, so the NUL separators keep the key unambiguous.
+    payload = f"{temperature}\0{max_tokens}\0{system_prompt}\0{user_message}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cached_evaluation(key: str) -> Optional[Dict[str, Any]]:
+    """Return a deep copy of the cached evaluation for a payload digest, or None."""
+    with _response_cache_lock:
+        result = _response_cache.get(key)
+        if result is not None:
+            _response_cache.move_to_end(key)
+            return copy.deepcopy(result)
+    if _disk_cache is None:
+        return None
+    
+    # Another process may have paid for this verdict already
+    result = _disk_cache.get(key)
+    if result is None:
+        return None
+    _remember_evaluation(key, result)
+    return copy.deepcopy(result)
+
+
+def _remember_evaluation(key: str, result: Dict[str, Any]):
+    """Keep an evaluation in memory, evicting the least recently used entry when full."""
+    with _response_cache_lock:
+        _response_cache[key] = result
+        _response_cache.move_to_end(key)
+        if len(_response_cache) > _RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def _store_evaluation(key: str, result: Dict[str, Any]):
+    """Cache a copy of a parsed LLM evaluation in memory and, when configured, on disk."""
+    # Verdicts hold lists, so the cache keeps its own deep copy and callers may edit theirs
+    _remember_evaluation(key, copy.deepcopy(result))
+    if _disk_cache is not None:
+        _disk_cache.set(key, result, expire=_DISK_CACHE_EXPIRE_SECONDS)
+
+
+def _parse_verdict(llm_response: str) -> Optional[Dict[str, Any]]:
+    """Turn an LLM reply into an evaluation result, or None if it holds no usable verdict."""
+    # Mock and error responses are not JSON objects, so they fail without a parse attempt
+    llm_response = llm_response.strip()
+    if not llm_response.startswith("{"):
+        return None
+    try:
+        parsed = json_utils.loads(llm_response)
+    except json_utils.JSONDecodeError:
+        return None
+    return _verdict_from_json(parsed)
+
+
+def _verdict_from_json(parsed: Any) -> Optional[Dict[str, Any]]:
+    """Turn one decoded verdict object into an evaluation result, or None if it is unusable."""
+    # A verdict without a usable score is treated like a failed call
+    raw_score = parsed.get("score") if isinstance(parsed, dict) else None
+    if raw_score is None:
+        return None
+    if isinstance(raw_score, float):
+        score = raw_score
+    else:
+        # Integer scores and numeric strings still convert
+        try:
+            score = float(raw_score)
+        except (ValueError, TypeError):
+            return None
+    
+    return {
+        "score": score,
+        "feedback": parsed.get("feedback", _DEFAULT_FEEDBACK),
+        "strengths": parsed.get("strengths", []),
+        "weaknesses": parsed.get("weaknesses", []),
+        "criterion_scores": {},  # Initialize empty criterion_scores for LLM evaluation
+        "evaluation_method": "llm",
+        "educational_insights": [],  # Initialize empty educational_insights for LLM evaluation
+        "educational_summary": "LLM evaluation completed"
+    }
+
+
+# Intents shorter than this carry too little meaning for the LLM judge to add anything
+_MIN_INTENT_LENGTH = 3
+
+
+def _is_trivial_request(chart_spec: Dict[str, Any], original_intent: str) -> bool:
+    """Check for a spec missing its mark, encoding or data values, or a near-empty intent."""
+    data = chart_spec.get("data") or {}
+    return (
+        not chart_spec.get("mark")
+        or not chart_spec.get("encoding")
+        or not isinstance(data, dict)
+        or not data.get("values")
+        or len(original_intent.strip()) < _MIN_INTENT_LENGTH
+    )
+
+
+# Intent kinds recognised by the rule-based fallback, in matching priority order
+_INTENT_TIME, _INTENT_COMPARE, _INTENT_DISTRIBUTION, _INTENT_GENERAL = range(4)
+
+
+class _SpecFeatures(NamedTuple):
+    """Everything the rule-based fallback inspects, extracted from a spec in one pass."""
+    mark: Any
+    intent_kind: int
+    has_title: bool
+    has_title_text: bool
+    has_width: bool
+    has_height: bool
+    n_data: int
+    structured_rows: bool
+    x_has_title: bool
+    y_has_title: bool
+    has_fields: bool
+    has_color: bool
+
+
+# Intent keywords per intent kind, indexed by kind
+_INTENT_KEYWORDS = (
+    ("time", "trend", "month", "year"),
+    ("compare", "region", "category"),
+    ("distribution", "spread", "correlation")
+)
+
+# All keywords in one pattern with one group per intent kind, so a match's lastindex is its
+# kind plus one. Keywords match as substrings (so "monthly" counts as "month"); the lookahead
+# reports overlapping hits too, so "categoryear" still finds "year". Matching ignores ASCII
+# case, which saves lowering a copy of the intent.
+_INTENT_RE = re.compile(
+    "(?=" + "|".join(f"({'|'.join(keywords)})" for keywords in _INTENT_KEYWORDS) + ")",
+    re.IGNORECASE | re.ASCII
+)
+
+
+def _intent_kind(original_intent: str) -> int:
+    """Classify an intent as time-based, comparative, distributional or general."""
+    # The lowest kind found wins, keeping the time > compare > distribution priority
+    return min((match.lastindex - 1 for match in _INTENT_RE.finditer(original_intent)), default=_INTENT_GENERAL)
+
+
+def _extract_features(chart_spec: Dict[str, Any], original_intent: str) -> _SpecFeatures:
+    """Read the spec fields and intent keywords the rule-based fallback scores on."""
+    title = chart_spec.get("title", {})
+    encoding = chart_spec.get("encoding", {})
+    x_encoding = encoding.get("x", {})
+    y_encoding = encoding.get("y", {})
+    data = chart_spec.get("data") or {}
+    data = (data.get("values") or []) if isinstance(data, dict) else []
+    return _SpecFeatures(
+        mark=chart_spec.get("mark", ""),
+        intent_kind=_intent_kind(original_intent),
+        has_title=bool(title),
+        has_title_text=bool(title and (isinstance(title, str) or title.get("text"))),
+        has_width="width" in chart_spec,
+        has_height="height" in chart_spec,
+        n_data=len(data),
+        structured_rows=bool(data) and isinstance(data[0], dict) and len(data[0]) >= 2,
+        x_has_title=x_encoding.get("title") is not None,
+        y_has_title=y_encoding.get("title") is not None,
+        has_fields=bool(x_encoding.get("field") and y_encoding.get("field")),
+        has_color=bool(encoding.get("color"))
+    )
+
+
+# Intent appropriateness by intent kind (row) and mark code (column)
+_MARK_CODES = {"line": 1, "area": 2, "bar": 3, "column": 4, "point": 5, "circle": 6}
+_APPROPRIATENESS = np.array([
+    # other, line, area, bar, column, point, circle
+    [-0.5, 1.0, 0.8, -0.5, -0.5, -0.5, -0.5],  # time
+    [0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0],  # compare
+    [0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 1.0],  # distribution
+    [0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5]  # general
+])
+
+# Plain-float rows of the same table for scoring one chart
+_APPROPRIATENESS_ROWS = _APPROPRIATENESS.tolist()
+
+
+def _mark_code(mark: Any) -> int:
+    """Column of a mark in the appropriateness table; 0 for other and non-string marks."""
+    return _MARK_CODES.get(mark, 0) if isinstance(mark, str) else 0
+
+
+def _score_features(features: _SpecFeatures) -> Tuple[float, float, float, float, float]:
+    """
+    Score the five fallback criteria from extracted features.
+    
+    Returns:
+        Tuple: (intent, clarity, insight, aesthetics, data accuracy) scores
+    """
+    intent_score = _APPROPRIATENESS_ROWS[features.intent_kind][_mark_code(features.mark)]
+    
+    clarity_score = 0.0
+    if features.has_title_text:
+        clarity_score += 0.5
+    if features.x_has_title and features.y_has_title:
+        clarity_score += 0.5
+    elif features.x_has_title or features.y_has_title:
+        clarity_score += 0.25
+    
+    n_data = features.n_data
+    insight_score = 0.5 if n_data >= 5 else 0.3 if n_data >= 3 else 0.0
+    
+    aesthetic_score = 0.0
+    if features.has_width and features.has_height:
+        aesthetic_score += 0.5
+    if features.has_title:
+        aesthetic_score += 0.3
+    if features.has_color:
+        aesthetic_score += 0.2
+    
+    accuracy_score = 0.0
+    if n_data > 0:
+        accuracy_score += 0.5
+        if features.structured_rows:
+            accuracy_score += 0.3
+    if features.has_fields:
+        accuracy_score += 0.2
+    
+    return intent_score, clarity_score, insight_score, aesthetic_score, accuracy_score
+
+
+# Vectorised form of _score_features for batch scoring. Feature columns: has title text,
+# both axes titled, one axis titled, width and height, any title, color, any data,
+# structured rows, both fields, five or more points, three or four points.
+_FEATURE_WEIGHTS = np.array([0.5, 0.5, 0.25, 0.5, 0.3, 0.2, 0.5, 0.3, 0.2, 0.5, 0.3])
+_BASE_SCORE = 7.0
+
+def _feature_row(features: _SpecFeatures) -> Tuple[bool, ...]:
+    """Flatten extracted features into the columns _FEATURE_WEIGHTS applies to."""
+    n_data = features.n_data
+    return (
+        features.has_title_text,
+        features.x_has_title and features.y_has_title,
+        features.x_has_title != features.y_has_title,
+        features.has_width and features.has_height,
+        features.has_title,
+        features.has_color,
+        n_data > 0,
+        n_data > 0 and features.structured_rows,
+        features.has_fields,
+        n_data >= 5,
+        3 <= n_data < 5
+    )
+
+
+# Educational insights about chart type selection
+_CHART_TYPE_GUIDE = {
+    "bar": "Bar charts are excellent for comparing categories or showing discrete values. They work well for sales by region, product comparisons, or any categorical data.",
+    "line": "Line charts are perfect for showing trends over time, continuous data, or relationships between variables. They excel at displaying time series data.",
+    "point": "Scatter plots (point charts) are ideal for showing correlations, distributions, or relationships between two continuous variables.",
+    "area": "Area charts are great for showing cumulative data over time or emphasizing volume. They work well for stacked data or showing parts of a whole over time."
+}
+
+# Intent feedback per intent kind: (marks, feedback, insight) rows, the first whose marks
+# include the chart's mark winning; marks of None match any chart. Feedback may use {mark}.
+_INTENT_FEEDBACK = {
+    _INTENT_TIME: (
+        (("line",), "Line chart appropriately shows temporal trends.",
+         f"✅ **Time Series Choice**: Perfect! Line charts are the standard choice for time-based data because they clearly show trends and patterns over time. {_CHART_TYPE_GUIDE['line']}"),
+        (("area",), "Area chart shows temporal trends but line might be clearer.",
+         f"⚠️ **Time Series Choice**: Good choice, but consider that line charts often show trends more clearly than area charts. {_CHART_TYPE_GUIDE['area']}"),
+        (None, "Chart type '{mark}' may not be optimal for time-based data.",
+         f"❌ **Time Series Choice**: For time-based data, line charts are typically the best choice. {_CHART_TYPE_GUIDE['line']}")
+    ),
+    _INTENT_COMPARE: (
+        (("bar", "column"), "Bar chart effectively compares categories.",
+         f"✅ **Comparison Choice**: Excellent! Bar charts are the gold standard for comparing categories because they make it easy to compare values at a glance. {_CHART_TYPE_GUIDE['bar']}"),
+        (None, "Chart type '{mark}' may not be optimal for comparisons.",
+         f"⚠️ **Comparison Choice**: For comparing categories, bar charts are usually the most effective choice. {_CHART_TYPE_GUIDE['bar']}")
+    ),
+    _INTENT_DISTRIBUTION: (
+        (("point", "circle"), "Scatter plot effectively shows distribution and correlations.",
+         f"✅ **Distribution Choice**: Perfect! Scatter plots excel at showing distributions, correlations, and relationships between variables. {_CHART_TYPE_GUIDE['point']}"),
+        (None, "Chart type '{mark}' may not show distribution effectively.",
+         f"⚠️ **Distribution Choice**: For showing distributions and correlations, scatter plots are typically the best choice. {_CHART_TYPE_GUIDE['point']}")
+    ),
+    _INTENT_GENERAL: (
+        (None, "Chart type '{mark}' is generally suitable for the request.",
+         "ℹ️ **Chart Type**: The chosen chart type should work well for this request. Consider the data type and what you want to emphasize."),
+    )
+}
+
+
+def _precompose(*checks: Dict[Any, Tuple[Tuple[str, ...], Tuple[str, ...]]]) -> Dict[Tuple[Any, ...], Tuple[str, str]]:
+    """
+    Join the feedback and insight sentences of every combination of check outcomes.
+    
+    Args:
+        checks: One mapping per check, from outcome to (feedback sentences, insight sentences)
+        
+    Returns:
+        Dict: (feedback, insight) strings keyed by the tuple of outcomes
+    """
+    composed = {}
+    for combination in itertools.product(*(check.items() for check in checks)):
+        outcomes = tuple(outcome for outcome, _ in combination)
+        feedback = " ".join(sentence for _, (sentences, _) in combination for sentence in sentences)
+        insight = " | ".join(sentence for _, (_, sentences) in combination for sentence in sentences)
+        composed[outcomes] = (feedback, insight)
+    return composed
+
+
+# Clarity feedback by (has title text, number of titled axes, both fields mapped)
+_CLARITY_FEEDBACK = _precompose(
+    {
+        True: (("Chart has a clear title.",), ("✅ **Title**: Good! A clear title helps users immediately understand what the chart shows.",)),
+        False: (("Chart lacks a descriptive title.",), ("❌ **Title**: Missing! Titles are crucial for chart clarity. They should be descriptive and specific.",))
+    },
+    {
+        2: (("Both axes are properly labeled.",), ("✅ **Axis Labels**: Excellent! Clear axis labels help users understand what each axis represents.",)),
+        1: (("One axis is labeled.",), ("⚠️ **Axis Labels**: Partial - Both axes should be labeled for maximum clarity.",)),
+        0: (("Axis labels are missing.",), ("❌ **Axis Labels**: Missing! Axis labels are essential for chart comprehension.",))
+    },
+    {
+        True: ((), ("✅ **Data Fields**: Good field mapping helps users understand what data is being visualized.",)),
+        False: ((), ("⚠️ **Data Fields**: Ensure data fields are properly mapped to axes.",))
+    }
+)
+
+# Insight potential feedback by data volume: 2 for five or more points, 1 for three or more
+_INSIGHT_FEEDBACK = _precompose({
+    2: (("Sufficient data points for meaningful analysis.",), ("✅ **Data Volume**: Good amount of data provides potential for meaningful insights and patterns.",)),
+    1: (("Moderate data points available.",), ("⚠️ **Data Volume**: More data points would provide better insight potential.",)),
+    0: (("Limited data points for analysis.",), ("❌ **Data Volume**: Very few data points limit the potential for meaningful insights.",))
+})
+
+# Aesthetics feedback by (has width and height, has title, has color encoding)
+_AESTHETICS_FEEDBACK = _precompose(
+    {
+        True: (("Chart has appropriate dimensions.",), ("✅ **Dimensions**: Good sizing ensures the chart is readable and well-proportioned.",)),
+        False: (("Chart dimensions could be improved.",), ("⚠️ **Dimensions**: Explicit width and height help ensure consistent display across different devices.",))
+    },
+    {
+        True: (("Chart has a title for context.",), ("✅ **Title**: Provides important context for the visualization.",)),
+        False: (("Chart lacks a title.",), ("❌ **Title**: A title is essential for professional-looking charts.",))
+    },
+    {
+        True: (("Chart uses color effectively.",), ("✅ **Color**: Color encoding can enhance readability and highlight important patterns.",)),
+        False: ((), ())
+    }
+)
+
+# Data accuracy feedback by (data level: 2 structured rows, 1 other data, 0 none; both fields mapped)
+_ACCURACY_FEEDBACK = _precompose(
+    {
+        2: (("Chart has data to visualize.", "Data structure is appropriate."),
+            ("✅ **Data Presence**: Chart contains data for visualization.", "✅ **Data Structure**: Data is properly structured with multiple fields.")),
+        1: (("Chart has data to visualize.", "Data structure could be improved."),
+            ("✅ **Data Presence**: Chart contains data for visualization.", "⚠️ **Data Structure**: Ensure data has appropriate fields for the chart type.")),
+        0: (("No data available for visualization.",), ("❌ **Data Presence**: Charts need data to be meaningful.",))
+    },
+    {
+        True: (("Data fields are properly encoded.",), ("✅ **Field Encoding**: Data fields are properly mapped to chart axes.",)),
+        False: (("Data encoding could be improved.",), ("⚠️ **Field Encoding**: Ensure data fields are properly mapped to chart axes.",))
+    }
+)
 
 
 class LLMEvaluatorAgent:
     """Agent responsible for LLM-based evaluation of chart specifications."""
     
-    def __init__(self):
+    __slots__ = ("name", "description", "evaluation_criteria", "emit_insights")
+    
+    def __init__(self, emit_insights: bool = True):
         self.name = "llm_evaluator"
         self.description = "Performs AI-based evaluation of chart specifications using LLM reasoning"
         
+        # Callers that never show educational insights can skip assembling them
+        self.emit_insights = emit_insights
+        
         # Evaluation criteria for LLM assessment
         self.evaluation_criteria = [
             "appropriateness_for_intent",
@@ -39,43 +531,214 @@ class LLMEvaluatorAgent:
         Returns:
             Dict[str, Any]: Detailed evaluation results
         """
+        # Skip the LLM when the rule-based verdict is already definitive
+        if _is_trivial_request(chart_spec, original_intent):
+            return self._simulate_llm_evaluation(chart_spec, original_intent)
+        
         # Try LLM-based evaluation
-        system_prompt = (
-            "You are an expert chart evaluator. Given a Vega-Lite chart specification and the original user intent, "
-            "evaluate the chart on a scale of 0 to 10 for how well it fulfills the intent, clarity, insight, aesthetics, and modern best practices. "
-            "Reward the use of modern color schemes, interactivity (selection, tooltips, hover effects), responsive design, and clean, readable axis titles (do not penalize for minor axis title imperfections if the chart is otherwise clear). "
-            "Consider: Does the chart type match the intent? Is the chart visually appealing and interactive? Are tooltips, selection, and responsive sizing present? Are axis titles clear and non-redundant? Is the color palette modern? "
-            "Provide a score, feedback, strengths, weaknesses, and educational insights."
-        )
-        user_message = (
-            f"User intent: {original_intent}\n"
-            f"Vega-Lite spec:\n{json.dumps(chart_spec, indent=2)}"
-        )
-        llm_response = chat_completion(
+        cached, user_message, cache_key, spec_fingerprint = self._prepare_request(chart_spec, original_intent)
+        if cached is not None:
+            return cached
+        
+        llm_future = _llm_executor.submit(
+            chat_completion,
             messages=[{"role": "user", "content": user_message}],
-            system_prompt=system_prompt,
-            temperature=0.2,
-            max_tokens=400
+            system_prompt=_SYSTEM_PROMPT,
+            temperature=_TEMPERATURE,
+            max_tokens=_MAX_TOKENS,
+            response_format=_RESPONSE_FORMAT,
+            prompt_cache_key=_PROMPT_CACHE_KEY
         )
+        
+        # The fallback is ready by the time the LLM answers, so a failed or slow call adds no latency
+        simulated = self._simulate_llm_evaluation(chart_spec, original_intent)
         try:
-            parsed = json.loads(llm_response)
-            score = float(parsed.get("score", 0.0))
-            feedback = parsed.get("feedback", "No feedback provided.")
-            strengths = parsed.get("strengths", [])
-            weaknesses = parsed.get("weaknesses", [])
-            return {
-                "score": score,
-                "feedback": feedback,
-                "strengths": strengths,
-                "weaknesses": weaknesses,
-                "criterion_scores": {},  # Initialize empty criterion_scores for LLM evaluation
-                "evaluation_method": "llm",
-                "educational_insights": [],  # Initialize empty educational_insights for LLM evaluation
-                "educational_summary": "LLM evaluation completed"
-            }
-        except Exception:
-            # If LLM fails or returns mock/error, fall back to rule-based simulation
+            llm_response = llm_future.result(timeout=Config.LLM_EVALUATOR_TIMEOUT)
+        except FutureTimeoutError:
+            print(f"⏱️ LLM evaluation timed out after {Config.LLM_EVALUATOR_TIMEOUT}s, using rule-based evaluation")
+            return simulated
+        return self._evaluation_from_response(
+            llm_response, chart_spec, original_intent, cache_key, spec_fingerprint, simulated
+        )
+    
+    async def evaluate_chart_async(self, chart_spec: Dict[str, Any], original_intent: str) -> Dict[str, Any]:
+        """
+        Evaluate a chart specification without blocking the event loop.
+        
+        Same caching and fallbacks as evaluate_chart, using the async OpenAI client.
+        
+        Args:
+            chart_spec (Dict[str, Any]): Vega-Lite chart specification
+            original_intent (str): Original user intent/query
+            
+        Returns:
+            Dict[str, Any]: Detailed evaluation results
+        """
+        if _is_trivial_request(chart_spec, original_intent):
+            return self._simulate_llm_evaluation(chart_spec, original_intent)
+        
+        cached, user_message, cache_key, spec_fingerprint = self._prepare_request(chart_spec, original_intent)
+        if cached is not None:
+            return cached
+        
+        try:
+            llm_response = await asyncio.wait_for(
+                chat_completion_async(
+                    messages=[{"role": "user", "content": user_message}],
+                    system_prompt=_SYSTEM_PROMPT,
+                    temperature=_TEMPERATURE,
+                    max_tokens=_MAX_TOKENS,
+                    response_format=_RESPONSE_FORMAT,
+                    prompt_cache_key=_PROMPT_CACHE_KEY
+                ),
+                timeout=Config.LLM_EVALUATOR_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            print(f"⏱️ LLM evaluation timed out after {Config.LLM_EVALUATOR_TIMEOUT}s, using rule-based evaluation")
             return self._simulate_llm_evaluation(chart_spec, original_intent)
+        return self._evaluation_from_response(llm_response, chart_spec, original_intent, cache_key, spec_fingerprint)
+    
+    def evaluate_charts_batch(self, items: List[Tuple[Dict[str, Any], str]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate several chart specifications with one LLM request for all uncached ones.
+        
+        Charts whose verdict cannot be read from the combined answer are sent again as
+        concurrent single-chart requests.
+        
+        Args:
+            items (List[Tuple[Dict[str, Any], str]]): (chart_spec, original_intent) pairs
+            
+        Returns:
+            List[Dict[str, Any]]: Evaluation results in input order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        for index, (chart_spec, original_intent) in enumerate(items):
+            if _is_trivial_request(chart_spec, original_intent):
+                results[index] = self._simulate_llm_evaluation(chart_spec, original_intent)
+                continue
+            cached, user_message, cache_key, spec_fingerprint = self._prepare_request(chart_spec, original_intent)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append((index, user_message, cache_key, spec_fingerprint))
+        
+        if len(pending) > 1:
+            verdicts = self._combined_verdicts([user_message for _, user_message, _, _ in pending])
+            unresolved = []
+            for request, verdict in zip(pending, verdicts):
+                index, _, cache_key, spec_fingerprint = request
+                if verdict is None:
+                    unresolved.append(request)
+                    continue
+                _store_evaluation(cache_key, verdict)
+                _store_equivalent_evaluation(spec_fingerprint, items[index][1], verdict)
+                results[index] = verdict
+            pending = unresolved
+        if not pending:
+            return results
+        
+        llm_responses = chat_completion_batch(
+            [[{"role": "user", "content": user_message}] for _, user_message, _, _ in pending],
+            system_prompt=_SYSTEM_PROMPT,
+            temperature=_TEMPERATURE,
+            max_tokens=_MAX_TOKENS,
+            response_format=_RESPONSE_FORMAT,
+            prompt_cache_key=_PROMPT_CACHE_KEY
+        )
+        for (index, _, cache_key, spec_fingerprint), llm_response in zip(pending, llm_responses):
+            chart_spec, original_intent = items[index]
+            results[index] = self._evaluation_from_response(
+                llm_response, chart_spec, original_intent, cache_key, spec_fingerprint
+            )
+        return results
+    
+    def _combined_verdicts(self, user_messages: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Ask for every verdict in one request; a None entry marks a verdict that could not be read."""
+        charts = "\n\n".join(f"{number}. {message}" for number, message in enumerate(user_messages, 1))
+        response = chat_completion(
+            [{"role": "user", "content": _COMBINED_PREFIX + charts + _COMBINED_SUFFIX + str(len(user_messages))}],
+            system_prompt=_SYSTEM_PROMPT,
+            temperature=_TEMPERATURE,
+            max_tokens=min(_MAX_TOKENS * len(user_messages), _MAX_COMBINED_TOKENS),
+            response_format=_COMBINED_FORMAT,
+            prompt_cache_key=_PROMPT_CACHE_KEY
+        )
+        
+        try:
+            evaluations = json_utils.loads(response)["evaluations"]
+        except (json_utils.JSONDecodeError, KeyError, TypeError):
+            evaluations = None
+        if type(evaluations) is not list or len(evaluations) != len(user_messages):
+            return [None] * len(user_messages)
+        return [_verdict_from_json(evaluation) for evaluation in evaluations]
+    
+    def _prepare_request(self, chart_spec: Dict[str, Any], original_intent: str) -> Tuple[Optional[Dict[str, Any]], str, str, str]:
+        """
+        Build the LLM request for a chart and look for a cached verdict.
+        
+        Returns:
+            Tuple: (cached result or None, user message, payload digest, spec fingerprint)
+        """
+        # Per-call data stays in the user message, after the static system prompt. The intent
+        # leads, since optimization loops re-evaluate revised specs for the same intent.
+        # The spec is serialised once, compactly (indentation only costs tokens), and the
+        # same text feeds the prompt and the spec fingerprint
+        spec_json = _canonical_json(chart_spec)
+        user_message = (
+            f"User intent: {original_intent}\n"
+            f"Vega-Lite spec:\n{spec_json}"
+        )
+        
+        # Identical requests reuse the parsed verdict and skip the LLM round trip
+        cache_key = _payload_key(_SYSTEM_PROMPT, user_message, _TEMPERATURE, _MAX_TOKENS)
+        spec_fingerprint = _spec_fingerprint(spec_json)
+        cached = _cached_evaluation(cache_key)
+        if cached is not None:
+            print(f"🎯 Using cached LLM evaluation for: {original_intent[:50]}...")
+            return cached, user_message, cache_key, spec_fingerprint
+        
+        # Otherwise reuse the verdict for the same intent written differently on the identical spec
+        cached = _equivalent_evaluation(spec_fingerprint, original_intent)
+        if cached is not None:
+            print(f"🎯 Using cached LLM evaluation for equivalent intent: {original_intent[:50]}...")
+        return cached, user_message, cache_key, spec_fingerprint
+    
+    def _evaluation_from_response(self, llm_response: str, chart_spec: Dict[str, Any], original_intent: str,
+                                  cache_key: str, spec_fingerprint: str,
+                                  simulated: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Parse an LLM verdict and cache it, falling back to the (possibly precomputed) rule-based simulation."""
+        result = _parse_verdict(llm_response)
+        if result is None:
+            return simulated if simulated is not None else self._simulate_llm_evaluation(chart_spec, original_intent)
+        
+        # Only real LLM verdicts are cached, so a failed call is retried next time
+        _store_evaluation(cache_key, result)
+        _store_equivalent_evaluation(spec_fingerprint, original_intent, result)
+        return result
+    
+    def evaluate_charts_simulated_batch(self, chart_specs: List[Dict[str, Any]], original_intents: List[str]) -> List[float]:
+        """
+        Score many charts with the rule-based fallback at once, without feedback.
+        
+        Features are extracted into one matrix and scored with a single matrix-vector
+        product plus an intent/mark lookup, for sweeps that only need the number.
+        
+        Args:
+            chart_specs (List[Dict[str, Any]]): Vega-Lite chart specifications
+            original_intents (List[str]): Original user intent per chart
+            
+        Returns:
+            List[float]: Score (0-10) per chart, on the same scale as _simulate_llm_evaluation
+        """
+        features = [_extract_features(chart_spec, intent) for chart_spec, intent in zip(chart_specs, original_intents)]
+        if not features:
+            return []
+        feature_matrix = np.array([_feature_row(row) for row in features], dtype=np.float64)
+        intent_kinds = np.array([row.intent_kind for row in features])
+        mark_codes = np.array([_mark_code(row.mark) for row in features])
+        scores = _BASE_SCORE + feature_matrix @ _FEATURE_WEIGHTS + _APPROPRIATENESS[intent_kinds, mark_codes]
+        return np.clip(scores, 0.0, 10.0).tolist()
     
     def _simulate_llm_evaluation(self, chart_spec: Dict[str, Any], original_intent: str) -> Dict[str, Any]:
         """
@@ -88,253 +751,94 @@ class LLMEvaluatorAgent:
         Returns:
             Dict[str, Any]: Simulated evaluation results with educational explanations
         """
-        score = 7.0  # Base score
-        feedback_parts = []
+        # Scoring works on features extracted in one pass; the helpers below only word the feedback
+        features = _extract_features(chart_spec, original_intent)
+        intent_score, clarity_score, insight_score, aesthetic_score, accuracy_score = _score_features(features)
+        
+        intent_feedback, intent_insight = self._evaluate_intent_appropriateness(features)
+        clarity_feedback, clarity_insight = self._evaluate_clarity(features)
+        insight_feedback, insight_insight = self._evaluate_insight_potential(features)
+        aesthetic_feedback, aesthetic_insight = self._evaluate_aesthetics(features)
+        accuracy_feedback, accuracy_insight = self._evaluate_data_accuracy(features)
+        
         strengths = []
         weaknesses = []
-        criterion_scores = {}
-        educational_insights = []
-        
-        # Evaluate appropriateness for intent
-        intent_score, intent_feedback, intent_insight = self._evaluate_intent_appropriateness(chart_spec, original_intent)
-        score += intent_score
-        feedback_parts.append(intent_feedback)
-        criterion_scores["intent_appropriateness"] = intent_score
-        educational_insights.append(intent_insight)
         if intent_score > 0:
             strengths.append("Appropriate chart type for the request")
         else:
             weaknesses.append("Chart type may not be optimal for the request")
-        
-        # Evaluate clarity and readability
-        clarity_score, clarity_feedback, clarity_insight = self._evaluate_clarity(chart_spec)
-        score += clarity_score
-        feedback_parts.append(clarity_feedback)
-        criterion_scores["clarity"] = clarity_score
-        educational_insights.append(clarity_insight)
         if clarity_score > 0.5:
             strengths.append("Clear and readable design")
         else:
             weaknesses.append("Could improve clarity and readability")
-        
-        # Evaluate insight potential
-        insight_score, insight_feedback, insight_insight = self._evaluate_insight_potential(chart_spec)
-        score += insight_score
-        feedback_parts.append(insight_feedback)
-        criterion_scores["insight_potential"] = insight_score
-        educational_insights.append(insight_insight)
         if insight_score > 0.3:
             strengths.append("Good potential for insights")
         else:
             weaknesses.append("Limited insight potential")
-        
-        # Evaluate aesthetic quality
-        aesthetic_score, aesthetic_feedback, aesthetic_insight = self._evaluate_aesthetics(chart_spec)
-        score += aesthetic_score
-        feedback_parts.append(aesthetic_feedback)
-        criterion_scores["aesthetics"] = aesthetic_score
-        educational_insights.append(aesthetic_insight)
         if aesthetic_score > 0.5:
             strengths.append("Good aesthetic quality")
         else:
             weaknesses.append("Could enhance visual appeal")
-        
-        # Evaluate data representation accuracy
-        accuracy_score, accuracy_feedback, accuracy_insight = self._evaluate_data_accuracy(chart_spec)
-        score += accuracy_score
-        feedback_parts.append(accuracy_feedback)
-        criterion_scores["data_accuracy"] = accuracy_score
-        educational_insights.append(accuracy_insight)
         if accuracy_score > 0.8:
             strengths.append("Accurate data representation")
         else:
             weaknesses.append("Data representation could be improved")
         
-        # Normalize score to 0-10 range
+        # Base score of 7 plus the criterion adjustments, normalized to the 0-10 range
+        score = 7.0 + intent_score + clarity_score + insight_score + aesthetic_score + accuracy_score
         final_score = max(0.0, min(10.0, score))
         
         # Combine feedback with educational insights
-        combined_feedback = " ".join(feedback_parts)
-        educational_summary = " | ".join(educational_insights)
+        combined_feedback = " ".join((intent_feedback, clarity_feedback, insight_feedback, aesthetic_feedback, accuracy_feedback))
+        if self.emit_insights:
+            educational_insights = [intent_insight, clarity_insight, insight_insight, aesthetic_insight, accuracy_insight]
+            educational_summary = " | ".join(educational_insights)
+        else:
+            educational_insights, educational_summary = [], ""
         
         return {
             "score": final_score,
             "feedback": combined_feedback,
             "strengths": strengths,
             "weaknesses": weaknesses,
-            "criterion_scores": criterion_scores,
+            "criterion_scores": {
+                "intent_appropriateness": intent_score,
+                "clarity": clarity_score,
+                "insight_potential": insight_score,
+                "aesthetics": aesthetic_score,
+                "data_accuracy": accuracy_score
+            },
             "evaluation_method": "simulated",
             "educational_insights": educational_insights,
             "educational_summary": educational_summary
         }
     
-    def _evaluate_intent_appropriateness(self, chart_spec: Dict[str, Any], original_intent: str) -> Tuple[float, str, str]:
-        """Evaluate if chart type is appropriate for the original intent with educational feedback."""
-        mark = chart_spec.get("mark", "")
-        intent_lower = original_intent.lower()
-        
-        # Educational insights about chart type selection
-        chart_type_guide = {
-            "bar": "Bar charts are excellent for comparing categories or showing discrete values. They work well for sales by region, product comparisons, or any categorical data.",
-            "line": "Line charts are perfect for showing trends over time, continuous data, or relationships between variables. They excel at displaying time series data.",
-            "point": "Scatter plots (point charts) are ideal for showing correlations, distributions, or relationships between two continuous variables.",
-            "area": "Area charts are great for showing cumulative data over time or emphasizing volume. They work well for stacked data or showing parts of a whole over time."
-        }
-        
-        # Simple rule-based intent matching with educational feedback
-        if "time" in intent_lower or "trend" in intent_lower or "month" in intent_lower or "year" in intent_lower:
-            if mark == "line":
-                return 1.0, "Line chart appropriately shows temporal trends.", f"✅ **Time Series Choice**: Perfect! Line charts are the standard choice for time-based data because they clearly show trends and patterns over time. {chart_type_guide.get('line', '')}"
-            elif mark == "area":
-                return 0.8, "Area chart shows temporal trends but line might be clearer.", f"⚠️ **Time Series Choice**: Good choice, but consider that line charts often show trends more clearly than area charts. {chart_type_guide.get('area', '')}"
-            else:
-                return -0.5, f"Chart type '{mark}' may not be optimal for time-based data.", f"❌ **Time Series Choice**: For time-based data, line charts are typically the best choice. {chart_type_guide.get('line', '')}"
-        
-        elif "compare" in intent_lower or "region" in intent_lower or "category" in intent_lower:
-            if mark in ["bar", "column"]:
-                return 1.0, "Bar chart effectively compares categories.", f"✅ **Comparison Choice**: Excellent! Bar charts are the gold standard for comparing categories because they make it easy to compare values at a glance. {chart_type_guide.get('bar', '')}"
-            else:
-                return 0.0, f"Chart type '{mark}' may not be optimal for comparisons.", f"⚠️ **Comparison Choice**: For comparing categories, bar charts are usually the most effective choice. {chart_type_guide.get('bar', '')}"
-        
-        elif "distribution" in intent_lower or "spread" in intent_lower or "correlation" in intent_lower:
-            if mark in ["point", "circle"]:
-                return 1.0, "Scatter plot effectively shows distribution and correlations.", f"✅ **Distribution Choice**: Perfect! Scatter plots excel at showing distributions, correlations, and relationships between variables. {chart_type_guide.get('point', '')}"
-            else:
-                return 0.0, f"Chart type '{mark}' may not show distribution effectively.", f"⚠️ **Distribution Choice**: For showing distributions and correlations, scatter plots are typically the best choice. {chart_type_guide.get('point', '')}"
-        
-        else:
-            return 0.5, f"Chart type '{mark}' is generally suitable for the request.", f"ℹ️ **Chart Type**: The chosen chart type should work well for this request. Consider the data type and what you want to emphasize."
+    def _evaluate_intent_appropriateness(self, features: _SpecFeatures) -> Tuple[str, str]:
+        """Explain whether the chart type suits the original intent, with educational feedback."""
+        mark = features.mark
+        for marks, feedback, insight in _INTENT_FEEDBACK[features.intent_kind]:
+            if marks is None or mark in marks:
+                return feedback.format(mark=mark), insight
     
-    def _evaluate_clarity(self, chart_spec: Dict[str, Any]) -> Tuple[float, str, str]:
-        """Evaluate chart clarity and readability with educational feedback."""
-        encoding = chart_spec.get("encoding", {})
-        title = chart_spec.get("title", {})
-        
-        clarity_score = 0.0
-        feedback_parts = []
-        insights = []
-        
-        # Check title
-        if title and (isinstance(title, str) or title.get("text")):
-            clarity_score += 0.5
-            feedback_parts.append("Chart has a clear title.")
-            insights.append("✅ **Title**: Good! A clear title helps users immediately understand what the chart shows.")
-        else:
-            feedback_parts.append("Chart lacks a descriptive title.")
-            insights.append("❌ **Title**: Missing! Titles are crucial for chart clarity. They should be descriptive and specific.")
-        
-        # Check axis labels
-        x_has_title = encoding.get("x", {}).get("title") is not None
-        y_has_title = encoding.get("y", {}).get("title") is not None
-        
-        if x_has_title and y_has_title:
-            clarity_score += 0.5
-            feedback_parts.append("Both axes are properly labeled.")
-            insights.append("✅ **Axis Labels**: Excellent! Clear axis labels help users understand what each axis represents.")
-        elif x_has_title or y_has_title:
-            clarity_score += 0.25
-            feedback_parts.append("One axis is labeled.")
-            insights.append("⚠️ **Axis Labels**: Partial - Both axes should be labeled for maximum clarity.")
-        else:
-            feedback_parts.append("Axis labels are missing.")
-            insights.append("❌ **Axis Labels**: Missing! Axis labels are essential for chart comprehension.")
-        
-        # Check for data field names
-        x_field = encoding.get("x", {}).get("field")
-        y_field = encoding.get("y", {}).get("field")
-        
-        if x_field and y_field:
-            insights.append("✅ **Data Fields**: Good field mapping helps users understand what data is being visualized.")
-        else:
-            insights.append("⚠️ **Data Fields**: Ensure data fields are properly mapped to axes.")
-        
-        return clarity_score, " ".join(feedback_parts), " | ".join(insights)
+    def _evaluate_clarity(self, features: _SpecFeatures) -> Tuple[str, str]:
+        """Explain chart clarity and readability with educational feedback."""
+        titled_axes = features.x_has_title + features.y_has_title
+        return _CLARITY_FEEDBACK[features.has_title_text, titled_axes, features.has_fields]
     
-    def _evaluate_insight_potential(self, chart_spec: Dict[str, Any]) -> Tuple[float, str, str]:
-        """Evaluate the potential for insights with educational feedback."""
-        data = chart_spec.get("data", {}).get("values", [])
-        
-        if len(data) >= 5:
-            return 0.5, "Sufficient data points for meaningful analysis.", "✅ **Data Volume**: Good amount of data provides potential for meaningful insights and patterns."
-        elif len(data) >= 3:
-            return 0.3, "Moderate data points available.", "⚠️ **Data Volume**: More data points would provide better insight potential."
-        else:
-            return 0.0, "Limited data points for analysis.", "❌ **Data Volume**: Very few data points limit the potential for meaningful insights."
+    def _evaluate_insight_potential(self, features: _SpecFeatures) -> Tuple[str, str]:
+        """Explain the potential for insights with educational feedback."""
+        volume = 2 if features.n_data >= 5 else 1 if features.n_data >= 3 else 0
+        return _INSIGHT_FEEDBACK[(volume,)]
     
-    def _evaluate_aesthetics(self, chart_spec: Dict[str, Any]) -> Tuple[float, str, str]:
-        """Evaluate aesthetic quality with educational feedback."""
-        has_width = "width" in chart_spec
-        has_height = "height" in chart_spec
-        has_title = chart_spec.get("title", {})
-        
-        aesthetic_score = 0.0
-        feedback_parts = []
-        insights = []
-        
-        if has_width and has_height:
-            aesthetic_score += 0.5
-            feedback_parts.append("Chart has appropriate dimensions.")
-            insights.append("✅ **Dimensions**: Good sizing ensures the chart is readable and well-proportioned.")
-        else:
-            feedback_parts.append("Chart dimensions could be improved.")
-            insights.append("⚠️ **Dimensions**: Explicit width and height help ensure consistent display across different devices.")
-        
-        if has_title:
-            aesthetic_score += 0.3
-            feedback_parts.append("Chart has a title for context.")
-            insights.append("✅ **Title**: Provides important context for the visualization.")
-        else:
-            feedback_parts.append("Chart lacks a title.")
-            insights.append("❌ **Title**: A title is essential for professional-looking charts.")
-        
-        # Check for color encoding
-        color_encoding = chart_spec.get("encoding", {}).get("color")
-        if color_encoding:
-            aesthetic_score += 0.2
-            feedback_parts.append("Chart uses color effectively.")
-            insights.append("✅ **Color**: Color encoding can enhance readability and highlight important patterns.")
-        
-        return aesthetic_score, " ".join(feedback_parts), " | ".join(insights)
+    def _evaluate_aesthetics(self, features: _SpecFeatures) -> Tuple[str, str]:
+        """Explain aesthetic quality with educational feedback."""
+        has_dimensions = features.has_width and features.has_height
+        return _AESTHETICS_FEEDBACK[has_dimensions, features.has_title, features.has_color]
     
-    def _evaluate_data_accuracy(self, chart_spec: Dict[str, Any]) -> Tuple[float, str, str]:
-        """Evaluate data representation accuracy with educational feedback."""
-        data = chart_spec.get("data", {}).get("values", [])
-        encoding = chart_spec.get("encoding", {})
-        
-        accuracy_score = 0.0
-        feedback_parts = []
-        insights = []
-        
-        if data and len(data) > 0:
-            accuracy_score += 0.5
-            feedback_parts.append("Chart has data to visualize.")
-            insights.append("✅ **Data Presence**: Chart contains data for visualization.")
-            
-            # Check if data structure is appropriate
-            if isinstance(data[0], dict) and len(data[0]) >= 2:
-                accuracy_score += 0.3
-                feedback_parts.append("Data structure is appropriate.")
-                insights.append("✅ **Data Structure**: Data is properly structured with multiple fields.")
-            else:
-                feedback_parts.append("Data structure could be improved.")
-                insights.append("⚠️ **Data Structure**: Ensure data has appropriate fields for the chart type.")
-        else:
-            feedback_parts.append("No data available for visualization.")
-            insights.append("❌ **Data Presence**: Charts need data to be meaningful.")
-        
-        # Check encoding accuracy
-        x_field = encoding.get("x", {}).get("field")
-        y_field = encoding.get("y", {}).get("field")
-        
-        if x_field and y_field:
-            accuracy_score += 0.2
-            feedback_parts.append("Data fields are properly encoded.")
-            insights.append("✅ **Field Encoding**: Data fields are properly mapped to chart axes.")
-        else:
-            feedback_parts.append("Data encoding could be improved.")
-            insights.append("⚠️ **Field Encoding**: Ensure data fields are properly mapped to chart axes.")
-        
-        return accuracy_score, " ".join(feedback_parts), " | ".join(insights)
+    def _evaluate_data_accuracy(self, features: _SpecFeatures) -> Tuple[str, str]:
+        """Explain data representation accuracy with educational feedback."""
+        data_level = 0 if features.n_data == 0 else 2 if features.structured_rows else 1
+        return _ACCURACY_FEEDBACK[data_level, features.has_fields]
     
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -353,7 +857,58 @@ class LLMEvaluatorAgent:
             raise ValueError("chart_spec is required in state")
         
         evaluation_results = self.evaluate_chart(chart_spec, user_query)
+        return self._state_with_evaluation(state, evaluation_results)
+    
+    def run_batch(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate several states at once, batching their LLM requests.
+        
+        Args:
+            states (List[Dict[str, Any]]): States each containing chart_spec and user_query
+            
+        Returns:
+            List[Dict[str, Any]]: Updated states with LLM evaluation results, in input order
+        """
+        items = []
+        for state in states:
+            chart_spec = state.get("chart_spec")
+            if not chart_spec:
+                raise ValueError("chart_spec is required in state")
+            items.append((chart_spec, state.get("user_query", "")))
+        
+        evaluations = self.evaluate_charts_batch(items)
+        return [self._state_with_evaluation(state, results) for state, results in zip(states, evaluations)]
+    
+    async def arun_many(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate several states concurrently on the event loop.
+        
+        Every LLM request is in flight at once, so the wall-clock time approaches that
+        of the slowest one. A state whose evaluation raises gets the rule-based result.
+        
+        Args:
+            states (List[Dict[str, Any]]): States each containing chart_spec and user_query
+            
+        Returns:
+            List[Dict[str, Any]]: Updated states with LLM evaluation results, in input order
+        """
+        if not all(state.get("chart_spec") for state in states):
+            raise ValueError("chart_spec is required in state")
         
+        evaluations = await asyncio.gather(
+            *(self.evaluate_chart_async(state["chart_spec"], state.get("user_query", "")) for state in states),
+            return_exceptions=True
+        )
+        updated_states = []
+        for state, evaluation_results in zip(states, evaluations):
+            if isinstance(evaluation_results, Exception):
+                print(f"⚠️ LLM evaluation failed: {evaluation_results}, using rule-based evaluation")
+                evaluation_results = self._simulate_llm_evaluation(state["chart_spec"], state.get("user_query", ""))
+            updated_states.append(self._state_with_evaluation(state, evaluation_results))
+        return updated_states
+    
+    def _state_with_evaluation(self, state: Dict[str, Any], evaluation_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge evaluation results into a state and its agent outputs."""
         return {
             **state,
             "llm_score": evaluation_results["score"],
@@ -400,4 +955,5 @@ if __name__ == "__main__":
     }
     
     result = agent.run(test_state)
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
@@ -27,6 +27,25 @@ class Config:
     HEURISTIC_WEIGHT: float = float(os.getenv("HEURISTIC_WEIGHT", "0.4"))
     LLM_WEIGHT: float = float(os.getenv("LLM_WEIGHT", "0.6"))
     
+    # Minimum query similarity (0-1) for reusing a learned chart spec
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    
+    # Chart builder LLM batching
+    CHART_BATCH_WINDOW_MS: float = float(os.getenv("CHART_BATCH_WINDOW_MS", "10"))
+    CHART_BATCH_MAX_SIZE: int = int(os.getenv("CHART_BATCH_MAX_SIZE", "8"))
+    
+    # Schema-guided chart and evaluation output; needs a model with json_schema support (e.g. gpt-4o, gpt-4.1)
+    CHART_JSON_SCHEMA: bool = os.getenv("CHART_JSON_SCHEMA", "false").lower() in ("1", "true", "yes")
+    
+    # Seed for generated template chart data; unset draws fresh values each run
+    CHART_DATA_SEED: Optional[int] = int(os.getenv("CHART_DATA_SEED")) if os.getenv("CHART_DATA_SEED") else None
+    
+    # Seconds to wait for the LLM judge before using the rule-based evaluation
+    LLM_EVALUATOR_TIMEOUT: float = float(os.getenv("LLM_EVALUATOR_TIMEOUT", "30"))
+    
+    # Directory for LLM verdicts shared across processes (needs diskcache); unset keeps them in memory
+    EVALUATOR_CACHE_DIR: Optional[str] = os.getenv("EVALUATOR_CACHE_DIR") or None
+    
     @classmethod
     def validate_config(cls) -> bool:
         """Validate that required configuration is present."""
@@ -57,4 +76,12 @@ MAX_ITERATIONS=5
 CONTINUE_THRESHOLD=8.5
 HEURISTIC_WEIGHT=0.4
 LLM_WEIGHT=0.6
+SEMANTIC_CACHE_THRESHOLD=0.92
+CHART_BATCH_WINDOW_MS=10
+CHART_BATCH_MAX_SIZE=8
+# Set to true only for models with json_schema support (e.g. gpt-4o, gpt-4.1)
+CHART_JSON_SCHEMA=false
+LLM_EVALUATOR_TIMEOUT=30
+# CHART_DATA_SEED=42
+# EVALUATOR_CACHE_DIR=/var/cache/promptsmith/evaluator
 """ 
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+json_utils.py
+
+JSON helpers backed by orjson when it is installed, falling back to the standard library.
+"""
+
+import json
+from typing import Any, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+# orjson has no incremental decoding, so raw_decode always uses the standard library
+_DECODER = json.JSONDecoder()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def raw_decode(text: str, start: int = 0) -> Tuple[Any, int]:
+    """Parse the JSON document starting at text[start], ignoring anything after it."""
+    return _DECODER.raw_decode(text, start)
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """
+    Serialise an object to a JSON string, compact unless indent is set (two spaces).
+    
+    Set sort_keys for a canonical form, e.g. when the output is hashed for a cache key.
+    """
+    if orjson:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option or None).decode()
+    if indent:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys)
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys)
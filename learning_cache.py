@@ -5,11 +5,105 @@ This module implements a learning cache that stores patterns, issues, and soluti
 from previous optimization runs to enable intelligent suggestions without LLM calls.
 """
 
-import json
+import math
 import os
+import re
+import threading
+from collections import Counter
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import hashlib
+import json_utils
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Filler words that do not change what a chart query is asking for
+_STOP_WORDS = frozenset({
+    "a", "an", "the", "me", "my", "our", "show", "display", "give", "create", "make",
+    "plot", "chart", "graph", "visualize", "of", "for", "per", "by", "in", "on", "and",
+    "with", "across", "please", "i", "want", "see", "to", "what", "is", "are", "how"
+})
+
+
+def _query_vector(query: str) -> Dict[str, float]:
+    """Build a unit-length bag-of-words vector for a user query."""
+    tokens = []
+    for token in _TOKEN_RE.findall(query.lower()):
+        if token in _STOP_WORDS:
+            continue
+        # Fold simple plurals so "regions" and "region" match
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    counts = Counter(tokens)
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {token: count / norm for token, count in counts.items()} if norm else {}
+
+
+def _cosine(query_vector: Dict[str, float], cached_vector: Dict[str, float]) -> float:
+    """Cosine similarity of two unit-length query vectors."""
+    return sum(weight * cached_vector.get(token, 0.0) for token, weight in query_vector.items())
+
+
+class SemanticChartCache:
+    """
+    In-memory cache of freshly generated chart specs, looked up by query similarity.
+    
+    Unlike the learned chart patterns, entries are added straight after generation,
+    before evaluation, so rephrased repeats within a session skip the LLM. A spec is
+    only reused for the exact prompt it was generated from, since the optimization
+    loop rewrites the prompt for the same query on every iteration. Entries are not
+    persisted and the oldest are evicted first. Specs are kept as JSON and every hit
+    decodes its own copy, so callers may edit the spec they get.
+    """
+    
+    # Queries this short are too generic to reuse a spec for
+    MIN_QUERY_LENGTH = 10
+    
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        # (normalised query, prompt) → (query vector, chart spec JSON)
+        self._entries: Dict[Tuple[str, str], Tuple[Dict[str, float], str]] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, user_query: str, prompt: str, threshold: float = 0.92) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Return (chart_spec, chart_spec_json) for the most similar query cached with this prompt, if close enough."""
+        query_vector = _query_vector(user_query)
+        if not query_vector:
+            return None
+        
+        best = None
+        best_similarity = threshold
+        with self._lock:
+            for (_, cached_prompt), (cached_vector, chart_spec_json) in self._entries.items():
+                if cached_prompt != prompt:
+                    continue
+                similarity = _cosine(query_vector, cached_vector)
+                if similarity >= best_similarity:
+                    best = chart_spec_json
+                    best_similarity = similarity
+        return (json_utils.loads(best), best) if best is not None else None
+    
+    def insert(self, user_query: str, prompt: str, chart_spec_json: str):
+        """Cache a chart spec (as JSON) generated from a prompt for a user query."""
+        if len(user_query) <= self.MIN_QUERY_LENGTH:
+            return
+        query_vector = _query_vector(user_query)
+        if not query_vector:
+            return
+        
+        key = (user_query.strip().lower(), prompt)
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (query_vector, chart_spec_json)
+    
+    def clear(self):
+        """Drop all cached specs."""
+        with self._lock:
+            self._entries = {}
 
 
 class LearningCache:
@@ -28,6 +122,15 @@ class LearningCache:
             "feedback_patterns": {}    # Issues → feedback patterns
         }
         
+        # Query vectors for similarity lookups, keyed by query hash
+        self._query_vectors: Dict[str, Dict[str, float]] = {}
+        
+        # Serialised chart specs, keyed by query hash
+        self._chart_spec_json: Dict[str, str] = {}
+        
+        # Bumped whenever patterns change so callers can key memoised lookups on it
+        self.version = 0
+        
         # Load patterns from cache
         self._load_patterns()
     
@@ -35,8 +138,8 @@ class LearningCache:
         """Load cache from file."""
         if os.path.exists(self.cache_file):
             try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
+                with open(self.cache_file, 'rb') as f:
+                    return json_utils.loads(f.read())
             except Exception as e:
                 print(f"Warning: Could not load cache file: {e}")
         return {"runs": [], "patterns": {}}
@@ -44,8 +147,10 @@ class LearningCache:
     def _save_cache(self):
         """Save cache to file."""
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2)
+            # Serialise before opening so an encoding error cannot truncate the file
+            cache_json = json_utils.dumps(self.cache, indent=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                f.write(cache_json)
         except Exception as e:
             print(f"Warning: Could not save cache file: {e}")
     
@@ -54,6 +159,13 @@ class LearningCache:
         patterns = self.cache.get("patterns", {})
         for pattern_type in self.patterns:
             self.patterns[pattern_type] = patterns.get(pattern_type, {})
+        
+        self._query_vectors = {}
+        self._chart_spec_json = {}
+        for query_hash, query_pattern in self.patterns["query_patterns"].items():
+            if query_hash in self.patterns["chart_patterns"]:
+                self._query_vectors[query_hash] = _query_vector(query_pattern["query"])
+        self.version += 1
     
     def _save_patterns(self):
         """Save learned patterns to cache."""
@@ -130,6 +242,9 @@ class LearningCache:
         # Learn chart patterns
         if final_score >= 8.0:
             self.patterns["chart_patterns"][query_hash] = chart_spec
+            self._query_vectors[query_hash] = _query_vector(user_query)
+            self._chart_spec_json.pop(query_hash, None)
+            self.version += 1
     
     def _hash_query(self, query: str) -> str:
         """Create a hash for a user query."""
@@ -149,6 +264,48 @@ class LearningCache:
             return self.patterns["chart_patterns"][query_hash]
         return None
     
+    def suggest_chart_spec_json(self, user_query: str) -> Optional[str]:
+        """
+        Return the cached chart spec for a user query serialised as JSON.
+        
+        The string is computed on first request and reused until the pattern is relearned.
+        It holds the spec as learned; the chart builder enhances decoded copies of it.
+        """
+        query_hash = self._hash_query(user_query)
+        chart_spec_json = self._chart_spec_json.get(query_hash)
+        if chart_spec_json is None:
+            chart_spec = self.patterns["chart_patterns"].get(query_hash)
+            if chart_spec is None:
+                return None
+            chart_spec_json = json_utils.dumps(chart_spec)
+            self._chart_spec_json[query_hash] = chart_spec_json
+        return chart_spec_json
+    
+    def find_similar_query(self, user_query: str, threshold: float = 0.92) -> Optional[str]:
+        """Return the most similar learned query with a chart spec, if it is close enough."""
+        query_vector = _query_vector(user_query)
+        if not query_vector:
+            return None
+        
+        best_hash = None
+        best_similarity = threshold
+        for query_hash, cached_vector in self._query_vectors.items():
+            similarity = _cosine(query_vector, cached_vector)
+            if similarity >= best_similarity:
+                best_hash = query_hash
+                best_similarity = similarity
+        
+        if best_hash is None:
+            return None
+        return self.patterns["query_patterns"][best_hash]["query"]
+    
+    def suggest_similar_chart_spec(self, user_query: str, threshold: float = 0.92) -> Optional[Dict[str, Any]]:
+        """Suggest the chart spec of the most similar learned query if it is close enough."""
+        similar_query = self.find_similar_query(user_query, threshold)
+        if similar_query is None:
+            return None
+        return self.suggest_chart_spec(similar_query)
+    
     def suggest_improvements(self, heuristic_issues: List[str], final_score: float = 0.0) -> List[str]:
         """Suggest improvements based on learned issue patterns. Only use cache if score is low (<8.0)."""
         if final_score >= 8.0:
@@ -180,6 +337,9 @@ class LearningCache:
         self.cache = {"runs": [], "patterns": {}}
         for pattern_type in self.patterns:
             self.patterns[pattern_type] = {}
+        self._query_vectors = {}
+        self._chart_spec_json = {}
+        self.version += 1
         self._save_cache()
         print("🧠 Learning cache cleared successfully")
     
@@ -187,10 +347,14 @@ class LearningCache:
         """Reset only the patterns while keeping run history."""
         for pattern_type in self.patterns:
             self.patterns[pattern_type] = {}
+        self._query_vectors = {}
+        self._chart_spec_json = {}
+        self.version += 1
         self.cache["patterns"] = {}
         self._save_cache()
         print("🔄 Patterns reset successfully")
 
 
-# Global cache instance
-learning_cache = LearningCache() 
\ No newline at end of file
+# Global cache instances
+learning_cache = LearningCache()
+semantic_chart_cache = SemanticChartCache() 
\ No newline at end of file
@@ -4,24 +4,103 @@ llm_utils.py
 Utility functions for OpenAI GPT chat completions (OpenAI Python SDK v1.x).
 """
 
-import os
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from config import Config
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
 except ImportError:
-    OpenAI = None
+    AsyncOpenAI = OpenAI = None
+
+try:
+    # httpx clients preconfigured with the SDK's timeouts (openai>=1.17)
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+except ImportError:
+    DefaultAsyncHttpxClient = DefaultHttpxClient = None
+
+try:
+    import h2  # enables HTTP/2 in httpx
+except ImportError:
+    h2 = None
 
 _client = None
+_async_client = None
+
+# Connection pool shared by all requests of one client
+_MAX_CONNECTIONS = 100
+_MAX_KEEPALIVE_CONNECTIONS = 50
+
+
+def _http_client_args(http_client_class) -> Dict[str, Any]:
+    """
+    Build the http_client argument for an OpenAI client.
+    
+    With h2 installed, concurrent requests are multiplexed over a few HTTP/2
+    connections instead of each opening its own TCP and TLS session.
+    """
+    if h2 is None or http_client_class is None:
+        return {}
+    import httpx
+    return {
+        "http_client": http_client_class(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=_MAX_CONNECTIONS,
+                max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+    }
+
 
 def get_openai_client():
     global _client
     if _client is None and OpenAI and Config.OPENAI_API_KEY:
-        _client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        _client = OpenAI(api_key=Config.OPENAI_API_KEY, **_http_client_args(DefaultHttpxClient))
     return _client
 
 
+def get_async_openai_client():
+    global _async_client
+    if _async_client is None and AsyncOpenAI and Config.OPENAI_API_KEY:
+        _async_client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY, **_http_client_args(DefaultAsyncHttpxClient))
+    return _async_client
+
+
+def _completion_args(
+    messages: List[Dict[str, str]],
+    model: Optional[str],
+    temperature: float,
+    max_tokens: int,
+    stop: Optional[List[str]],
+    system_prompt: Optional[str],
+    response_format: Optional[Dict[str, Any]],
+    prompt_cache_key: Optional[str],
+) -> Dict[str, Any]:
+    """Build the keyword arguments for chat.completions.create."""
+    chat_messages = []
+    if system_prompt:
+        chat_messages.append({"role": "system", "content": system_prompt})
+    chat_messages.extend(messages)
+
+    args = {
+        "model": model or Config.OPENAI_MODEL,
+        "messages": chat_messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stop": stop,
+    }
+    if response_format:
+        args["response_format"] = response_format
+    if prompt_cache_key:
+        # Sent as a raw body field so older 1.x SDKs without the keyword still work
+        args["extra_body"] = {"prompt_cache_key": prompt_cache_key}
+    return args
+
+
 def chat_completion(
     messages: List[Dict[str, str]],
     model: Optional[str] = None,
@@ -29,31 +108,250 @@ def chat_completion(
     max_tokens: int = 1024,
     stop: Optional[List[str]] = None,
     system_prompt: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    prompt_cache_key: Optional[str] = None,
 ) -> str:
     """
     Call OpenAI's chat completion API (v1.x) and return the response text.
+
+    Pass response_format (e.g. {"type": "json_object"}) to request structured output.
+    The system prompt is always sent first so OpenAI's automatic prefix caching can
+    reuse it; prompt_cache_key groups requests that share that prefix onto the same cache.
     """
     client = get_openai_client()
     if not client:
         print("[llm_utils] OpenAI API not available or API key missing. Falling back to mock response.")
         return "[MOCK LLM RESPONSE]"
 
-    model = model or Config.OPENAI_MODEL
+    try:
+        response = client.chat.completions.create(
+            **_completion_args(
+                messages, model, temperature, max_tokens, stop, system_prompt, response_format, prompt_cache_key
+            )
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"[llm_utils] OpenAI API error: {e}")
+        return f"[LLM ERROR: {e}]"
+
 
-    chat_messages = []
-    if system_prompt:
-        chat_messages.append({"role": "system", "content": system_prompt})
-    chat_messages.extend(messages)
+async def chat_completion_async(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 1024,
+    stop: Optional[List[str]] = None,
+    system_prompt: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> str:
+    """
+    Async version of chat_completion using the SDK's AsyncOpenAI client.
+
+    Takes the same arguments and falls back the same way, so callers can
+    gather many requests on one event loop without a thread per call.
+    """
+    client = get_async_openai_client()
+    if not client:
+        print("[llm_utils] OpenAI API not available or API key missing. Falling back to mock response.")
+        return "[MOCK LLM RESPONSE]"
 
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=chat_messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stop=stop,
+        response = await client.chat.completions.create(
+            **_completion_args(
+                messages, model, temperature, max_tokens, stop, system_prompt, response_format, prompt_cache_key
+            )
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"[llm_utils] OpenAI API error: {e}")
-        return f"[LLM ERROR: {e}]" 
\ No newline at end of file
+        return f"[LLM ERROR: {e}]"
+
+
+class _JsonEndScanner:
+    """Follows bracket depth across streamed chunks to spot where the top-level JSON value closes."""
+
+    __slots__ = ("depth", "started", "in_string", "escaped")
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume a chunk and return True once the first complete object or array has closed."""
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{" or char == "[":
+                self.depth += 1
+                self.started = True
+            elif char == "}" or char == "]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return True
+        return False
+
+
+async def chat_completion_stream_async(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 1024,
+    stop: Optional[List[str]] = None,
+    system_prompt: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    prompt_cache_key: Optional[str] = None,
+    stop_at_json_end: bool = True,
+) -> str:
+    """
+    Streaming version of chat_completion_async that collects the text as it arrives.
+
+    With stop_at_json_end, the stream is closed as soon as the top-level JSON
+    value in the response is complete, so trailing tokens are never waited for.
+    Falls back the same way as chat_completion.
+    """
+    client = get_async_openai_client()
+    if not client:
+        print("[llm_utils] OpenAI API not available or API key missing. Falling back to mock response.")
+        return "[MOCK LLM RESPONSE]"
+
+    try:
+        stream = await client.chat.completions.create(
+            stream=True,
+            **_completion_args(
+                messages, model, temperature, max_tokens, stop, system_prompt, response_format, prompt_cache_key
+            )
+        )
+        scanner = _JsonEndScanner() if stop_at_json_end else None
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            parts.append(content)
+            if scanner is not None and scanner.feed(content):
+                await stream.response.aclose()
+                break
+        return "".join(parts).strip()
+    except Exception as e:
+        print(f"[llm_utils] OpenAI API error: {e}")
+        return f"[LLM ERROR: {e}]"
+
+
+def chat_completion_batch(
+    messages_batch: List[List[Dict[str, str]]],
+    model: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 1024,
+    stop: Optional[List[str]] = None,
+    system_prompt: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> List[str]:
+    """
+    Run several chat completions at once and return the responses in input order.
+
+    The chat completions API has no multi-prompt endpoint, so the batch is fanned
+    out over a thread pool that shares the client's connection pool.
+    """
+    if not messages_batch:
+        return []
+    if len(messages_batch) == 1:
+        return [chat_completion(
+            messages_batch[0], model, temperature, max_tokens, stop, system_prompt, response_format, prompt_cache_key
+        )]
+
+    with ThreadPoolExecutor(max_workers=len(messages_batch)) as executor:
+        futures = [
+            executor.submit(
+                chat_completion, messages, model, temperature, max_tokens, stop, system_prompt, response_format,
+                prompt_cache_key
+            )
+            for messages in messages_batch
+        ]
+        return [future.result() for future in futures]
+
+
+class ChatCompletionBatcher:
+    """
+    Coalesce concurrent chat_completion calls into chat_completion_batch calls.
+
+    Callers block in submit() while a background worker collects requests for up
+    to window_seconds (or until max_batch_size is reached). Each collected batch is
+    sent on a thread pool, so the collector keeps gathering the next batch while
+    earlier ones are in flight, and each caller gets its own response.
+    """
+
+    def __init__(self, window_seconds: float = 0.01, max_batch_size: int = 8, max_concurrent_batches: int = 8):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[Tuple[List[Dict[str, str]], Dict[str, Any], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches, thread_name_prefix="chat-completion-batch"
+        )
+
+    def submit(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Queue a chat completion and wait for its response."""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((messages, kwargs, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="chat-completion-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            try:
+                while len(items) < self.max_batch_size:
+                    items.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            self._flush(items)
+
+    def _flush(self, items: List[Tuple[List[Dict[str, str]], Dict[str, Any], Future]]):
+        """Group collected requests by settings and hand each group to the pool without waiting."""
+        # Requests can only share a batch call when their completion settings match
+        # Settings may hold lists and dicts, so group on their repr rather than hashing them
+        groups: Dict[str, List[Tuple[List[Dict[str, str]], Dict[str, Any], Future]]] = {}
+        for item in items:
+            groups.setdefault(repr(sorted(item[1].items())), []).append(item)
+
+        for group in groups.values():
+            self._executor.submit(self._send_group, group)
+
+    def _send_group(self, group: List[Tuple[List[Dict[str, str]], Dict[str, Any], Future]]):
+        """Send one group and resolve each caller's future with its own response."""
+        kwargs = group[0][1]
+        try:
+            responses = self._send([messages for messages, _, _ in group], kwargs)
+            if len(responses) != len(group):
+                raise RuntimeError(f"expected {len(group)} responses, got {len(responses)}")
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+        for (_, _, future), response in zip(group, responses):
+            future.set_result(response)
+
+    def _send(self, messages_batch: List[List[Dict[str, str]]], kwargs: Dict[str, Any]) -> List[str]:
+        """Send one group of requests that share settings; subclasses may combine them into one call."""
+        return chat_completion_batch(messages_batch, **kwargs)
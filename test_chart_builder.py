@@ -0,0 +1,263 @@
+import json_utils
+from agents.chart_builder import ChartBuilderAgent
+from learning_cache import learning_cache
+
+def test_template_match():
+    builder = ChartBuilderAgent()
+    # Test: explicit chart-type prompts over known fields build that chart from those fields
+    spec = builder._try_template_match("Create a bar chart of revenue by region.")
+    assert spec is not None, "Should match a bar chart of a known metric by a known dimension"
+    assert spec["mark"] == "bar" and spec["encoding"]["x"]["field"] == "region", "Should chart by region"
+    assert spec["encoding"]["y"]["title"] == "Revenue", "Should chart the matched metric"
+    spec = builder._try_template_match("line chart of sales over time")
+    assert spec is not None and spec["mark"] == "line", "Should match a line chart over time"
+    assert spec["encoding"]["x"]["field"] == "month", "Should chart time-based templates by month"
+    spec = builder._try_template_match("area chart of profit by month")
+    assert spec is not None and spec["mark"] == "area", "Should match an area chart over time"
+    # Test: prompts naming an unknown field or adding qualifiers fall through to the LLM
+    for prompt in (
+        "bar chart of profit by quarter",
+        "bar chart of average profit margin by region",
+        "line chart of sales excluding returns over time",
+        "pie chart of revenue by product",
+        "show me a dashboard",
+    ):
+        assert builder._try_template_match(prompt) is None, f"Should not template '{prompt}'"
+    # Test: no later tier templates them either, so they reach the LLM
+    for prompt in ("bar chart of revenue by team", "bar chart of profit by quarter"):
+        assert builder._build_chart_without_llm(prompt, "") is None, f"Should send '{prompt}' to the LLM"
+    print("All template match tests passed.")
+
+def test_bare_template_match():
+    builder = ChartBuilderAgent()
+    # Test: "<metric> by <dimension>" and "<metric> trend" over single known fields
+    spec = builder._try_template_match("revenue by region")
+    assert spec is not None and spec["mark"] == "bar", "Should match a bare metric by dimension"
+    assert spec["encoding"]["x"]["field"] == "region", "Should chart by the matched dimension"
+    spec = builder._try_template_match("conversion rate by product")
+    assert spec is not None and spec["encoding"]["x"]["field"] == "product", "Should accept a spaced metric name"
+    spec = builder._try_template_match("show our sales trend")
+    assert spec is not None and spec["mark"] == "line", "Should match a bare metric trend"
+    assert spec["encoding"]["x"]["field"] == "month", "Should chart a trend by month"
+    # Test: compound metrics, unencoded dimensions and extra clauses fall through to the LLM
+    for prompt in (
+        "show revenue excluding returns by region",
+        "plot average profit margin by quarter",
+        "show sales growth trend",
+        "revenue by region over time",
+        "revenue by category",
+    ):
+        assert builder._try_template_match(prompt) is None, f"Should not template '{prompt}'"
+    print("All bare template match tests passed.")
+
+def test_exact_cache_hits_are_independent():
+    builder = ChartBuilderAgent()
+    query = "learned revenue by region query for the exact cache test"
+    learning_cache._learn_from_run({
+        "user_query": query,
+        "prompt": "Create a bar chart of revenue by region",
+        "chart_spec": {
+            "mark": "bar",
+            "data": {"values": [{"region": "North", "revenue": 1}]},
+            "encoding": {"x": {"field": "region", "type": "nominal"}, "y": {"field": "revenue", "type": "quantitative"}}
+        },
+        "heuristic_issues": [],
+        "llm_feedback": "",
+        "final_score": 9.0
+    })
+    query_hash = learning_cache._hash_query(query)
+    try:
+        first = builder._build_chart_without_llm("any prompt", query)
+        assert first is not None and first["cache_hit"] == "exact_match", "Should hit the exact cache"
+        original = json_utils.dumps(first["chart_spec"], sort_keys=True)
+        # Test: mutating one hit's spec leaves later hits untouched
+        first["chart_spec"]["mark"]["type"] = "line"
+        first["chart_spec"]["encoding"]["x"]["field"] = "mutated"
+        first["chart_spec"]["data"]["values"].clear()
+        second = builder._build_chart_without_llm("any prompt", query)
+        assert json_utils.dumps(second["chart_spec"], sort_keys=True) == original, "Should return the cached spec"
+        # Test: the spec and its JSON describe the same chart
+        assert json_utils.loads(second["chart_spec_json"]) == second["chart_spec"], "Should return matching JSON"
+        # Test: the learned pattern itself is left as stored
+        assert "autosize" not in learning_cache.patterns["chart_patterns"][query_hash], "Should not enhance the pattern"
+    finally:
+        learning_cache._query_vectors.pop(query_hash, None)
+        learning_cache._chart_spec_json.pop(query_hash, None)
+        for table in ("query_patterns", "prompt_patterns", "chart_patterns"):
+            learning_cache.patterns[table].pop(query_hash, None)
+        learning_cache.version += 1
+    print("All exact cache isolation tests passed.")
+
+def test_enhanced_specs_do_not_share_fragments():
+    enhance = ChartBuilderAgent._enhance_chart_spec
+    first = enhance({"mark": "bar", "encoding": {}}, "revenue by region")
+    expected = json_utils.dumps(enhance({"mark": "bar", "encoding": {}}, "revenue by region"), sort_keys=True)
+    # Test: editing every added block of one spec leaves the next spec untouched
+    first["autosize"]["type"] = "pad"
+    first["encoding"]["color"]["scale"]["scheme"] = "viridis"
+    first["selection"]["highlight"]["on"] = "click"
+    first["encoding"]["tooltip"].append({"field": "Profit", "type": "quantitative"})
+    first["encoding"]["tooltip"][0]["title"] = "Area"
+    first["config"]["axis"]["labelFontSize"] = 8
+    second = enhance({"mark": "bar", "encoding": {}}, "revenue by region")
+    assert json_utils.dumps(second, sort_keys=True) == expected, "Should not share fragments between specs"
+    print("All enhancement isolation tests passed.")
+
+def test_dynamic_chart_keywords():
+    builder = ChartBuilderAgent()
+    cases = (
+        ("show monthly revenue", "bar", "month"),
+        ("regional sales", "bar", "region"),
+        ("trending profit", "line", "month"),
+        ("sales timeline", "line", "month"),
+    )
+    # Test: suffixed keywords pick the chart type and dimension they name
+    for query, mark, field in cases:
+        spec = builder._generate_dynamic_chart_spec(query, query)
+        assert spec["mark"] == mark, f"Should chart '{query}' as {mark}"
+        assert spec["encoding"]["x"]["field"] == field, f"Should chart '{query}' by {field}"
+    spec = builder._generate_dynamic_chart_spec("yearly profit", "yearly profit")
+    assert spec["encoding"]["x"]["title"] == "Year", "Should chart 'yearly profit' by year"
+    # Test: keywords inside other words do not count
+    spec = builder._generate_dynamic_chart_spec("disappointing sales", "disappointing sales")
+    assert spec["mark"] == "bar", "Should not read 'disappointing' as a point chart"
+    print("All dynamic chart keyword tests passed.")
+
+def test_trivial_tier():
+    builder = ChartBuilderAgent()
+    # Test: one known metric with one encoded dimension or a time hint skips the LLM, charting those fields
+    for prompt, field, title in (
+        ("monthly revenue", "month", "Revenue"),
+        ("regional sales", "region", "Sales"),
+        ("show revenues by regions", "region", "Revenue"),
+    ):
+        result = builder._build_chart_without_llm(prompt, "")
+        assert result is not None and result["generation_method"] == "trivial_template", f"Should template '{prompt}'"
+        assert result["chart_spec"]["encoding"]["x"]["field"] == field, f"Should chart '{prompt}' by {field}"
+        assert result["chart_spec"]["encoding"]["y"]["title"] == title, f"Should chart '{prompt}' as {title}"
+    # Test: unencoded dimensions, several metrics and a dimension plus a time hint go to the LLM
+    for prompt in (
+        "bar chart of revenue by team",
+        "profit by quarter",
+        "Create a chart showing revenue by region over time",
+        "revenue and profit by region",
+        "revenue by region and product",
+    ):
+        assert builder._build_chart_without_llm(prompt, "") is None, f"Should send '{prompt}' to the LLM"
+    print("All trivial tier tests passed.")
+
+def test_similar_query_hits_leave_the_pattern_untouched():
+    builder = ChartBuilderAgent()
+    learned_query = "learned similar tier test query revenue by region for every quarter"
+    learned_spec = {
+        "mark": "bar",
+        "data": {"values": [{"region": "North", "revenue": 1}]},
+        "encoding": {"x": {"field": "region", "type": "nominal"}, "y": {"field": "revenue", "type": "quantitative"}}
+    }
+    stored = json_utils.dumps(learned_spec, sort_keys=True)
+    learning_cache._learn_from_run({
+        "user_query": learned_query,
+        "prompt": "Create a bar chart of revenue by region",
+        "chart_spec": learned_spec,
+        "heuristic_issues": [],
+        "llm_feedback": "",
+        "final_score": 9.0
+    })
+    query_hash = learning_cache._hash_query(learned_query)
+    query = "learned similar tier test query: revenue by region for every quarter please"
+    try:
+        first = builder._build_chart_without_llm("any prompt", query)
+        assert first is not None and first["cache_hit"] == "semantic_match", "Should hit the similar-query tier"
+        # Test: the returned JSON is the enhanced spec that is returned
+        assert json_utils.loads(first["chart_spec_json"]) == first["chart_spec"], "Should return matching JSON"
+        assert "autosize" in first["chart_spec"], "Should enhance the returned spec"
+        # Test: the learned pattern is neither enhanced nor shared with callers
+        pattern = learning_cache.patterns["chart_patterns"][query_hash]
+        assert json_utils.dumps(pattern, sort_keys=True) == stored, "Should not enhance the stored pattern"
+        first["chart_spec"]["encoding"]["x"]["field"] = "mutated"
+        second = builder._build_chart_without_llm("any prompt", query)
+        assert second["chart_spec"]["encoding"]["x"]["field"] == "region", "Should return a fresh spec per hit"
+    finally:
+        learning_cache._query_vectors.pop(query_hash, None)
+        learning_cache._chart_spec_json.pop(query_hash, None)
+        for table in ("query_patterns", "prompt_patterns", "chart_patterns"):
+            learning_cache.patterns[table].pop(query_hash, None)
+        learning_cache.version += 1
+    print("All similar query isolation tests passed.")
+
+def _llm_reply(field):
+    """A valid Vega-Lite spec as the LLM would return it."""
+    return json_utils.dumps({
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "data": {"values": [{field: "North", "revenue": 1}]},
+        "mark": "bar",
+        "encoding": {"x": {"field": field, "type": "nominal"}, "y": {"field": "revenue", "type": "quantitative"}}
+    })
+
+def test_prompt_cache_hits_are_independent():
+    builder = ChartBuilderAgent()
+    prompt = "Compare revenue against headcount for each sales office, highlighting outliers"
+    first = builder._chart_from_llm_response(_llm_reply("office"), prompt, "")
+    assert first["generation_method"] == "llm", "Should accept a valid LLM spec"
+    # Test: mutating the LLM result or a cache hit leaves later hits untouched
+    first["chart_spec"]["encoding"]["x"]["field"] = "mutated"
+    hit = builder._build_chart_without_llm(prompt, "")
+    assert hit is not None and hit["cache_hit"] == "prompt_match", "Should hit the prompt cache"
+    assert hit["chart_spec"]["encoding"]["x"]["field"] == "office", "Should not share the LLM result's spec"
+    hit["chart_spec"]["data"]["values"].clear()
+    again = builder._build_chart_without_llm(prompt, "")
+    assert again["chart_spec"]["data"]["values"], "Should return a fresh spec per hit"
+    assert json_utils.loads(again["chart_spec_json"]) == again["chart_spec"], "Should return matching JSON"
+    print("All prompt cache isolation tests passed.")
+
+def test_session_cache_hits_are_independent():
+    builder = ChartBuilderAgent()
+    prompt = "Compare revenue against headcount for each regional branch office"
+    first = builder._chart_from_llm_response(_llm_reply("branch"), prompt, "revenue against headcount per branch office")
+    first["chart_spec"]["encoding"]["x"]["field"] = "mutated"
+    # Test: a rephrased query with the same prompt reuses the spec without sharing it
+    hit = builder._build_chart_without_llm(prompt, "revenue against headcount per branch office please")
+    assert hit is not None and hit["cache_hit"] == "semantic_match", "Should hit the session cache"
+    assert hit["chart_spec"]["encoding"]["x"]["field"] == "branch", "Should not share the LLM result's spec"
+    hit["chart_spec"]["mark"] = "line"
+    again = builder._build_chart_without_llm(prompt, "revenue against headcount per branch office please")
+    assert again["chart_spec"]["mark"] != "line", "Should return a fresh spec per hit"
+    print("All session cache isolation tests passed.")
+
+def test_replayed_results_are_independent():
+    builder = ChartBuilderAgent()
+    first = builder.build_chart("Create a bar chart of revenue by region")
+    expected = json_utils.dumps(first["chart_spec"], sort_keys=True)
+    # Test: a retry with the same prompt replays the last result without sharing its spec
+    first["chart_spec"]["encoding"]["x"]["field"] = "mutated"
+    first["chart_spec_json"] = "{}"
+    replay = builder.build_chart("Create a bar chart of revenue by region")
+    assert replay["cache_hit"] == "last_prompt", "Should replay the last result"
+    assert json_utils.dumps(replay["chart_spec"], sort_keys=True) == expected, "Should not share the first caller's spec"
+    replay["chart_spec"]["mark"] = "line"
+    again = builder.build_chart("Create a bar chart of revenue by region")
+    assert json_utils.dumps(again["chart_spec"], sort_keys=True) == expected, "Should return a fresh spec per replay"
+    # Test: a different prompt is built afresh
+    assert builder.build_chart("line chart of sales over time")["cache_hit"] is None, "Should not replay other prompts"
+    print("All replay isolation tests passed.")
+
+def test_agent_output_keeps_chart_spec():
+    state = ChartBuilderAgent().run({"prompt": "Create a bar chart of revenue by region", "user_query": ""})
+    output = state["agent_outputs"]["chart_builder"]
+    # Test: the agent output still carries the spec, next to its JSON
+    assert output["chart_spec"] == state["chart_spec"], "Should keep chart_spec in the chart builder output"
+    assert json_utils.loads(output["chart_spec_json"]) == output["chart_spec"], "Should carry matching JSON"
+    print("All agent output tests passed.")
+
+if __name__ == "__main__":
+    test_template_match()
+    test_bare_template_match()
+    test_exact_cache_hits_are_independent()
+    test_enhanced_specs_do_not_share_fragments()
+    test_dynamic_chart_keywords()
+    test_trivial_tier()
+    test_similar_query_hits_leave_the_pattern_untouched()
+    test_prompt_cache_hits_are_independent()
+    test_session_cache_hits_are_independent()
+    test_replayed_results_are_independent()
+    test_agent_output_keeps_chart_spec()
@@ -0,0 +1,90 @@
+from agents.evaluator_llm import _DEFAULT_FEEDBACK, LLMEvaluatorAgent, _is_trivial_request, _parse_verdict
+
+def test_parse_verdict():
+    # Test: a full verdict keeps its fields and is marked as an LLM evaluation
+    verdict = _parse_verdict(' {"score": 8.5, "feedback": "Clear", "strengths": ["title"], "weaknesses": []}\n')
+    assert verdict is not None, "Should parse a well-formed verdict"
+    assert verdict["score"] == 8.5 and verdict["feedback"] == "Clear", "Should keep the score and feedback"
+    assert verdict["strengths"] == ["title"] and verdict["evaluation_method"] == "llm", "Should keep the details"
+    # Test: integer and numeric string scores convert, and missing feedback gets the default
+    assert _parse_verdict('{"score": 7}')["score"] == 7.0, "Should convert integer scores"
+    verdict = _parse_verdict('{"score": "6.5"}')
+    assert verdict["score"] == 6.5 and verdict["feedback"] == _DEFAULT_FEEDBACK, "Should convert string scores"
+    # Test: replies without a usable verdict are rejected
+    for reply in (
+        "[MOCK LLM RESPONSE]",
+        "Score: 8/10",
+        '{"score": 8.5',
+        '{"feedback": "No score"}',
+        '{"score": null}',
+        '{"score": "high"}',
+        '{"score": [8]}',
+        "",
+    ):
+        assert _parse_verdict(reply) is None, f"Should reject {reply!r}"
+    print("All verdict parsing tests passed.")
+
+def test_verdict_reuse_needs_equivalent_intent():
+    evaluator = LLMEvaluatorAgent(emit_insights=False)
+    chart_spec = {
+        "mark": "bar",
+        "data": {"values": [{"region": "North", "revenue": 120}]},
+        "encoding": {"x": {"field": "region"}, "y": {"field": "revenue"}},
+        "title": "Verdict reuse test chart"
+    }
+    intent = "Show revenue by region, including returns."
+    _, _, cache_key, spec_fingerprint = evaluator._prepare_request(chart_spec, intent)
+    evaluator._evaluation_from_response('{"score": 9.1}', chart_spec, intent, cache_key, spec_fingerprint)
+    # Test: an intent differing only in case, spacing or punctuation reuses the verdict
+    cached = evaluator._prepare_request(chart_spec, "show revenue by region  including returns")[0]
+    assert cached is not None and cached["score"] == 9.1, "Should reuse the verdict for an equivalent intent"
+    # Test: a reworded intent on the same spec is judged afresh
+    for other in (
+        "Show returns by region, including revenue.",
+        "Show revenue by region, excluding returns.",
+        "Show revenue by region",
+    ):
+        assert evaluator._prepare_request(chart_spec, other)[0] is None, f"Should not reuse the verdict for '{other}'"
+    # Test: the same intent on a different spec is judged afresh
+    other_spec = dict(chart_spec, mark="line")
+    assert evaluator._prepare_request(other_spec, intent)[0] is None, "Should not reuse the verdict across specs"
+    print("All verdict reuse tests passed.")
+
+def test_trivial_request_with_missing_data():
+    chart_spec = {"mark": "bar", "encoding": {"x": {"field": "region"}}, "data": {"values": [{"region": "North"}]}}
+    assert not _is_trivial_request(chart_spec, "show revenue by region"), "Should send a complete spec to the judge"
+    # Test: null, non-object and empty data count as trivial instead of raising
+    for data in (None, "data.csv", [{"region": "North"}], {}, {"values": []}, {"url": "data.csv"}):
+        assert _is_trivial_request(dict(chart_spec, data=data), "show revenue by region"), f"Should skip data={data!r}"
+    # Test: the full evaluation path handles null data
+    result = LLMEvaluatorAgent(emit_insights=False).evaluate_chart(dict(chart_spec, data=None), "show revenue by region")
+    assert "score" in result, "Should still score a spec with null data"
+    print("All trivial request tests passed.")
+
+def test_cached_verdicts_are_independent():
+    evaluator = LLMEvaluatorAgent(emit_insights=False)
+    chart_spec = {
+        "mark": "line",
+        "data": {"values": [{"month": "Jan", "sales": 120}]},
+        "encoding": {"x": {"field": "month"}, "y": {"field": "sales"}},
+        "title": "Verdict isolation test chart"
+    }
+    intent = "Show monthly sales for the verdict isolation test"
+    _, _, cache_key, spec_fingerprint = evaluator._prepare_request(chart_spec, intent)
+    reply = '{"score": 8.0, "strengths": ["clear axes"], "weaknesses": ["no legend"]}'
+    first = evaluator._evaluation_from_response(reply, chart_spec, intent, cache_key, spec_fingerprint)
+    # Test: edits to the fresh verdict or to any cache hit leave later hits untouched
+    first["strengths"].append("edited by caller")
+    for lookup_intent in (intent, intent.upper() + "!"):
+        hit = evaluator._prepare_request(chart_spec, lookup_intent)[0]
+        assert hit["strengths"] == ["clear axes"], f"Should not share lists with the caller for '{lookup_intent}'"
+        hit["weaknesses"].append("edited by caller")
+        assert evaluator._prepare_request(chart_spec, lookup_intent)[0]["weaknesses"] == ["no legend"], \
+            "Should return a fresh verdict per hit"
+    print("All verdict isolation tests passed.")
+
+if __name__ == "__main__":
+    test_parse_verdict()
+    test_verdict_reuse_needs_equivalent_intent()
+    test_trivial_request_with_missing_data()
+    test_cached_verdicts_are_independent()
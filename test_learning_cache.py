@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from learning_cache import LearningCache, SemanticChartCache
+
+def test_semantic_chart_cache_keying():
+    cache = SemanticChartCache()
+    cache.insert("show revenue by region", "prompt A", '{"mark":"bar"}')
+    # Test: the same query with the same prompt hits
+    assert cache.lookup("Show revenue by region", "prompt A") == ({"mark": "bar"}, '{"mark":"bar"}'), \
+        "Should reuse the spec for the prompt it was generated from"
+    # Test: the same query with a rewritten prompt misses
+    assert cache.lookup("show revenue by region", "prompt B") is None, "Should not reuse a spec across prompts"
+    # Test: a different query with the same prompt misses
+    assert cache.lookup("list employee headcount by department", "prompt A") is None, \
+        "Should not reuse a spec for an unrelated query"
+    # Test: one query cached under two prompts keeps both specs
+    cache.insert("show revenue by region", "prompt B", '{"mark":"line"}')
+    assert cache.lookup("show revenue by region", "prompt A")[0] == {"mark": "bar"}, "Should keep the first prompt's spec"
+    assert cache.lookup("show revenue by region", "prompt B")[0] == {"mark": "line"}, "Should keep the second prompt's spec"
+    # Test: every hit decodes its own spec
+    first = cache.lookup("show revenue by region", "prompt A")[0]
+    first["mark"] = "point"
+    assert cache.lookup("show revenue by region", "prompt A")[0] == {"mark": "bar"}, "Should not share specs between hits"
+    # Test: queries too short to be specific are not cached
+    cache.insert("revenue", "prompt A", '{"mark":"bar"}')
+    assert cache.lookup("revenue", "prompt A") is None, "Should not cache very short queries"
+    print("All semantic chart cache tests passed.")
+
+def test_cache_file_round_trips_utf8():
+    with tempfile.TemporaryDirectory() as directory:
+        cache_file = os.path.join(directory, "learning_cache.json")
+        cache = LearningCache(cache_file)
+        cache.cache["runs"].append({"user_query": "Umsatz nach Region in €, 東京 vs Zürich"})
+        cache._save_cache()
+        # Test: the file holds UTF-8 regardless of the platform's default encoding
+        with open(cache_file, "rb") as f:
+            assert "Zürich".encode("utf-8") in f.read(), "Should write the cache as UTF-8"
+        # Test: a fresh cache reads back the same runs
+        assert LearningCache(cache_file).cache["runs"] == cache.cache["runs"], "Should reload the saved runs"
+    print("All cache file encoding tests passed.")
+
+if __name__ == "__main__":
+    test_semantic_chart_cache_keying()
+    test_cache_file_round_trips_utf8()
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_utils import ChatCompletionBatcher, _JsonEndScanner
+
+
+class _EchoBatcher(ChatCompletionBatcher):
+    """Answers each request with its own message content and records every batch sent."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _send(self, messages_batch, kwargs):
+        self.batches.append(([messages[0]["content"] for messages in messages_batch], kwargs))
+        if kwargs.get("max_tokens") == 0:
+            return []
+        return [f"{messages[0]['content']}@{kwargs.get('temperature')}" for messages in messages_batch]
+
+
+def test_json_end_scanner():
+    # Test: a complete object in one chunk closes
+    assert _JsonEndScanner().feed('{"mark": "bar"}'), "Should close on the final brace"
+    # Test: an object split across chunks closes only on the last chunk
+    scanner = _JsonEndScanner()
+    assert not scanner.feed('{"encoding": {"x": '), "Should stay open while nested"
+    assert not scanner.feed('{"field": "region"}'), "Should stay open until the outer brace"
+    assert scanner.feed('}}'), "Should close once the outer object closes"
+    # Test: brackets and escaped quotes inside strings are ignored
+    scanner = _JsonEndScanner()
+    assert not scanner.feed('{"title": "Sales {by} [region] \\"'), "Should ignore brackets inside strings"
+    assert not scanner.feed('}\\""'), "Should treat an escaped quote as part of the string"
+    assert scanner.feed('}'), "Should close after the string ends"
+    # Test: prose before the JSON and a closing bracket before any opening one do not close
+    scanner = _JsonEndScanner()
+    assert not scanner.feed('Here is the spec: '), "Should stay open before the JSON starts"
+    assert scanner.feed('[1, 2]'), "Should close a top-level array"
+    assert not _JsonEndScanner().feed('} no json yet'), "Should not close before any bracket opens"
+    print("All JSON end scanner tests passed.")
+
+def test_chat_completion_batcher_routing():
+    batcher = _EchoBatcher(window_seconds=0.05, max_batch_size=8)
+    requests = [(f"q{i}", 0.0 if i % 2 else 0.2) for i in range(6)]
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        futures = [
+            pool.submit(batcher.submit, [{"role": "user", "content": content}], temperature=temperature)
+            for content, temperature in requests
+        ]
+        responses = [future.result(timeout=5) for future in futures]
+    # Test: every caller gets the response to its own request
+    assert responses == [f"{content}@{temperature}" for content, temperature in requests], \
+        "Each caller should get its own response"
+    # Test: requests with different settings never share a batch call
+    requested = dict(requests)
+    for contents, kwargs in batcher.batches:
+        assert all(requested[content] == kwargs["temperature"] for content in contents), \
+            "A batch should only hold requests with its own settings"
+    sent = sorted(content for contents, _ in batcher.batches for content in contents)
+    assert sent == sorted(requested), "Every request should be sent once"
+    assert len(batcher.batches) < len(requests), "Concurrent requests should be coalesced"
+    # Test: a response count mismatch fails the callers instead of misrouting responses
+    try:
+        batcher.submit([{"role": "user", "content": "q"}], max_tokens=0)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Should raise when the batch returns the wrong number of responses")
+    print("All batcher routing tests passed.")
+
+if __name__ == "__main__":
+    test_json_end_scanner()
+    test_chat_completion_batcher_routing()
@@ -0,0 +1,17 @@
+from text_utils import keyword_re
+
+def test_keyword_re():
+    pattern = keyword_re({"month", "region", "trend", "point", "time", "time series"})
+    # Test: keywords count with simple suffixes and findall returns the bare keyword
+    assert pattern.findall("monthly revenue") == ["month"], "Should match an -ly suffix"
+    assert pattern.findall("regional sales") == ["region"], "Should match an -al suffix"
+    assert pattern.findall("trending profit over months") == ["trend", "month"], "Should match -ing and plural suffixes"
+    # Test: longer keywords win over their prefixes
+    assert pattern.findall("a time series of sales") == ["time series"], "Should prefer the longer keyword"
+    # Test: keywords inside other words do not count
+    assert pattern.findall("disappointing sales") == [], "Should not match inside a longer word"
+    assert pattern.findall("semimonthly totals") == [], "Should only match at a word start"
+    print("All keyword regex tests passed.")
+
+if __name__ == "__main__":
+    test_keyword_re()
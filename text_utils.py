@@ -0,0 +1,23 @@
+"""
+text_utils.py
+
+Keyword matching shared by the agents, so they agree on which words a query mentions.
+"""
+
+import re
+from typing import Iterable
+
+# Simple suffixes a keyword may carry and still count, e.g. "months", "monthly",
+# "regional" and "trending"; "disappointing" still does not count as "point"
+_KEYWORD_SUFFIXES = r"(?:s|es|ly|al|ing)?"
+
+
+def keyword_re(keywords: Iterable[str]) -> "re.Pattern[str]":
+    """
+    Compile one regex that finds any of the keywords as a whole word.
+
+    Longer keywords are tried first, so "time series" wins over "time". findall
+    returns the bare keyword, without its suffix.
+    """
+    alternation = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(r"\b(" + alternation + r")" + _KEYWORD_SUFFIXES + r"\b")